@@ -0,0 +1,45 @@
+from app.logging import child_logger, is_level_enabled
+from starlette.datastructures import Headers
+from starlette.routing import BaseRoute
+
+ACCESS_LOG_LEVEL = "DEBUG"
+
+# Header capture is off by default; when enabled only these headers are recorded,
+# so credentials (authorization, cookie, ...) never reach the log sinks.
+ACCESS_LOG_CAPTURE_HEADERS = False
+ACCESS_LOG_HEADER_ALLOWLIST = frozenset({"user-agent", "content-type", "accept", "referer", "x-forwarded-for"})
+
+
+def access_log_enabled() -> bool:
+    return is_level_enabled(ACCESS_LOG_LEVEL)
+
+def _content_length(headers:Headers) -> int|None:
+    value = headers.get("content-length")
+    return int(value) if value and value.isdigit() else None
+
+def _allowed_headers(headers:Headers) -> dict:
+    return {name: value for name, value in headers.items() if name in ACCESS_LOG_HEADER_ALLOWLIST}
+
+def log_access(scope:dict, request_headers:Headers, status_code:int, response_headers:Headers, duration_ms:float, user_id:str|None) -> None:
+    """
+    Emits one compact record per request. The path is the route template
+    (/products/{product_id}) when a route matched, so records group per endpoint.
+    """
+    route:BaseRoute|None = scope.get("route")
+    record = {
+        "path": getattr(route, "path", scope["path"]),
+        "method": scope["method"],
+        "status_code": status_code,
+        "duration_ms": round(duration_ms, 2),
+        "user_id": user_id,
+        "request_bytes": _content_length(request_headers),
+        "response_bytes": _content_length(response_headers),
+    }
+    if ACCESS_LOG_CAPTURE_HEADERS:
+        record["request_headers"] = _allowed_headers(request_headers)
+        record["response_headers"] = _allowed_headers(response_headers)
+
+    child_logger.bind(**record).log(
+        ACCESS_LOG_LEVEL,
+        f'{record["method"]} {record["path"]} {status_code} {record["duration_ms"]}ms'
+    )
@@ -0,0 +1,59 @@
+"""Índices sobre store_id, claves foráneas y columnas de ordenamiento
+
+Revision ID: 5b8d2e7f4a13
+Revises: e3b7c1a94f20
+Create Date: 2026-10-18 11:02:17.504811
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5b8d2e7f4a13'
+down_revision: Union[str, None] = 'e3b7c1a94f20'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# (index name, table, columns). Composites lead with store_id and end with id so one
+# index covers the store filter, the sort column and the keyset tiebreaker.
+INDEXES = [
+    ('ix_customers_store_id_created_at', 'customers', ['store_id', 'created_at', 'id']),
+    ('ix_customers_store_id_email', 'customers', ['store_id', 'email', 'id']),
+    ('ix_customers_store_id_name', 'customers', ['store_id', 'name', 'id']),
+    ('ix_products_store_id_created_at', 'products', ['store_id', 'created_at', 'id']),
+    ('ix_products_store_id_name', 'products', ['store_id', 'name', 'id']),
+    ('ix_products_store_id_price', 'products', ['store_id', 'price', 'id']),
+    ('ix_products_store_id_stock', 'products', ['store_id', 'stock', 'id']),
+    ('ix_roles_store_id', 'roles', ['store_id']),
+    ('ix_user_stores_store_id', 'user_stores', ['store_id']),
+    ('ix_user_stores_user_id', 'user_stores', ['user_id']),
+    ('ix_orders_customer_id', 'orders', ['customer_id']),
+    ('ix_orders_store_id_created_at', 'orders', ['store_id', 'created_at', 'id']),
+    ('ix_orders_store_id_total', 'orders', ['store_id', 'total', 'id']),
+    ('ix_role_permissions_permission_id', 'role_permissions', ['permission_id']),
+    ('ix_role_permissions_role_id', 'role_permissions', ['role_id']),
+    ('ix_user_roles_role_id', 'user_roles', ['role_id']),
+    ('ix_user_roles_user_id', 'user_roles', ['user_id']),
+    ('ix_leads_customer_id', 'leads', ['customer_id']),
+    ('ix_leads_order_id', 'leads', ['order_id']),
+    ('ix_leads_product_id', 'leads', ['product_id']),
+    ('ix_leads_store_id', 'leads', ['store_id']),
+    ('ix_order_products_order_id', 'order_products', ['order_id']),
+    ('ix_order_products_product_id', 'order_products', ['product_id']),
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for index_name, table_name, columns in INDEXES:
+        op.create_index(index_name, table_name, columns, unique=False, if_not_exists=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for index_name, table_name, _ in reversed(INDEXES):
+        op.drop_index(index_name, table_name=table_name, if_exists=True)
@@ -0,0 +1,34 @@
+"""Tabla view_versions con el hash de cada vista
+
+Revision ID: 8c4f1a6d2b97
+Revises: 5b8d2e7f4a13
+Create Date: 2026-10-18 11:41:53.220934
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8c4f1a6d2b97'
+down_revision: Union[str, None] = '5b8d2e7f4a13'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('view_versions',
+    sa.Column('name', sa.String(), nullable=False),
+    sa.Column('definition_hash', sa.String(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('name')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('view_versions')
@@ -0,0 +1,42 @@
+"""Tabla store_stats con contadores por tienda
+
+Revision ID: e3b7c1a94f20
+Revises: dc9a08730662
+Create Date: 2026-10-18 10:12:41.318204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e3b7c1a94f20'
+down_revision: Union[str, None] = 'dc9a08730662'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('store_stats',
+    sa.Column('store_id', sa.String(), nullable=False),
+    sa.Column('entity', sa.String(), nullable=False),
+    sa.Column('row_count', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['store_id'], ['stores.id'], ),
+    sa.PrimaryKeyConstraint('store_id', 'entity')
+    )
+    for table_name in ('products', 'customers', 'orders', 'roles'):
+        op.execute(
+            f"INSERT INTO store_stats (store_id, entity, row_count, created_at, updated_at) "
+            f"SELECT store_id, '{table_name}', count(id), CURRENT_TIMESTAMP, CURRENT_TIMESTAMP "
+            f"FROM {table_name} WHERE store_id IS NOT NULL GROUP BY store_id"
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('store_stats')
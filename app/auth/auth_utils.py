@@ -1,7 +1,24 @@
-from app.database.models import Users, Roles, Permissions
+from app.database.models import Users, Roles, Permissions, RolePermissions, UserRoles
 from app.schemas.users_schemas import BasePermission
+from app.cache import TTLCache
 from typing import List
 from sqlalchemy.inspection import inspect
+from sqlalchemy.orm import Session
+from fastapi.routing import APIRoute
+
+PERMISSIONS_CACHE_TTL_SECONDS = 60
+PERMISSIONS_CACHE_MAX_USERS = 1024
+
+# user_id -> frozenset of active permission names
+permissions_cache = TTLCache(maxsize=PERMISSIONS_CACHE_MAX_USERS, ttl=PERMISSIONS_CACHE_TTL_SECONDS)
+
+LOGIN_THROTTLE_MAX_FAILURES = 5
+LOGIN_THROTTLE_WINDOW_SECONDS = 60
+LOGIN_THROTTLE_MAX_USERNAMES = 10000
+
+# (username, client IP) -> failed logins in a fixed window opened by the first failure.
+# Later failures don't extend it, and other clients can't lock a username out.
+login_failures_cache = TTLCache(maxsize=LOGIN_THROTTLE_MAX_USERNAMES, ttl=LOGIN_THROTTLE_WINDOW_SECONDS)
 
 def parse_permission_to_basepermission(permission:Permissions) -> BasePermission:
     permission_data:dict = {
@@ -25,3 +42,48 @@ def find_permission_by_name(permissions:List[BasePermission], name:str) -> BaseP
     found_permission = [permission for permission in permissions if permission.name == name and permission.state]
     return found_permission[0] if len(found_permission) > 0 else None
 
+
+def load_active_permission_names(user_id:str, db:Session) -> frozenset[str]:
+    rows = (
+        db.query(Permissions.name)
+        .join(RolePermissions, RolePermissions.permission_id == Permissions.id)
+        .join(UserRoles, UserRoles.role_id == RolePermissions.role_id)
+        .filter(UserRoles.user_id == user_id, Permissions.state == True)
+        .distinct()
+        .all()
+    )
+    return frozenset(name for (name,) in rows)
+
+def invalidate_user_permissions(user_id:str|None = None) -> None:
+    """
+    Drops cached permission sets. Without a user_id every entry is dropped, which is
+    what role and permission edits need since they can affect any number of users.
+    """
+    if user_id is None:
+        permissions_cache.clear()
+    else:
+        permissions_cache.invalidate(user_id)
+
+def route_permission_names(route:APIRoute) -> frozenset[str]:
+    """
+    Permission names that grant access to a route: its tag, the tag/method pair and
+    the endpoint function name. Holding any one of them is enough.
+    """
+    names = {route.name}
+    if route.tags:
+        tag = route.tags[0]
+        names.add(tag)
+        names.update(f'{tag.lower()}_{method.lower()}_method' for method in route.methods)
+    return frozenset(names)
+
+def login_throttle_key(username:str, client_host:str|None) -> tuple[str, str|None]:
+    return (username.lower(), client_host)
+
+def login_throttled(username:str, client_host:str|None) -> bool:
+    return login_failures_cache.get(login_throttle_key(username, client_host), 0) >= LOGIN_THROTTLE_MAX_FAILURES
+
+def record_login_failure(username:str, client_host:str|None) -> None:
+    login_failures_cache.incr(login_throttle_key(username, client_host))
+
+def reset_login_failures(username:str, client_host:str|None) -> None:
+    login_failures_cache.invalidate(login_throttle_key(username, client_host))
@@ -1,37 +1,66 @@
+import uuid
 from app.database.models import Permissions
 from app.database.database import get_db
+from app.auth.auth_utils import route_permission_names
+from sqlalchemy import insert
+from sqlalchemy.dialects import sqlite, postgresql
 from sqlalchemy.orm import Session
 from fastapi import FastAPI
+from fastapi.routing import APIRoute
+
+def protected_routes(app:FastAPI) -> list[APIRoute]:
+    return [route for route in app.routes if isinstance(route, APIRoute) and route.tags]
+
+def build_route_permissions_index(app:FastAPI) -> None:
+    """
+    Attaches the immutable set of permission names that grant access to each route,
+    so get_current_user only has to intersect it with the user's permission set.
+    """
+    for route in protected_routes(app):
+        route.required_permissions = route_permission_names(route)
 
 def check_permissions_to_build(app:FastAPI, db:Session) -> list[str]:
     
-    permissions = db.query(Permissions).all()
-    permission_names = [permission.name for permission in permissions]
-    
-    routes = app.routes[4:]
-    tag_permissions_to_create = list({*[route.tags[0] for route in routes if route.tags[0] not in permission_names]})
+    permission_names = {name for (name,) in db.query(Permissions.name).all()}
     
-    method_permissions = list({f'{route.tags[0].lower()}_{list(route.methods)[0].lower()}_method' for route in routes})
-    method_permissions_to_create = [method for method in method_permissions if method not in permission_names]
+    route_permissions = set()
+    for route in protected_routes(app):
+        route_permissions |= route_permission_names(route)
     
-    function_permissions_to_create = [route.name for route in routes if route.name not in permission_names]
-    
-    return tag_permissions_to_create + method_permissions_to_create + function_permissions_to_create
+    return sorted(route_permissions - permission_names)
     
 
+_INSERT_IGNORE_DIALECTS = {"sqlite": sqlite.insert, "postgresql": postgresql.insert}
+
+def insert_permissions(permission_names:list[str], db:Session) -> None:
+    """
+    Inserts the given permissions in one statement. On SQLite/PostgreSQL names that
+    another worker inserted meanwhile are skipped (ON CONFLICT DO NOTHING).
+    """
+    rows = [
+        {"id": str(uuid.uuid4()), "name": name, "state": True, "description": "Autogenerated permission"}
+        for name in permission_names
+    ]
+    dialect_insert = _INSERT_IGNORE_DIALECTS.get(db.get_bind().dialect.name)
+    if dialect_insert is not None:
+        statement = dialect_insert(Permissions).on_conflict_do_nothing(index_elements=[Permissions.name])
+    else:
+        statement = insert(Permissions)
+    db.execute(statement, rows)
+
 def build_permissions(app:FastAPI):
+    build_route_permissions_index(app)
     db:Session = next(get_db())
-    permissions_to_build:list[str] = check_permissions_to_build(app, db)
-    instanciated_permissions = [Permissions(name=permission, state=True, description="Autogenerated permission") for permission in permissions_to_build]
-    
-    if len(instanciated_permissions) == 0:
-        print('No permissions to build')
+    try:
+        permissions_to_build:list[str] = check_permissions_to_build(app, db)
+        if len(permissions_to_build) == 0:
+            print('No permissions to build')
+            return
+
+        insert_permissions(permissions_to_build, db)
+        db.commit()
+        print(f'Finished building {len(permissions_to_build)} permissions')
+    finally:
         db.close()
-        return
-    
-    db.add_all(instanciated_permissions)
-    db.commit()
-    db.close()
-    print(f'Finished building {len(permissions_to_build)} permissions')
     
     
\ No newline at end of file
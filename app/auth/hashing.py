@@ -1,8 +1,42 @@
+import asyncio
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from fastapi import HTTPException, status
 from passlib.context import CryptContext
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+# bcrypt is CPU bound (~250ms per call), so it runs on its own small pool instead of
+# the event loop or the shared threadpool. Work beyond the pool plus HASHING_MAX_PENDING
+# queued calls is rejected with a 503 rather than piling up latency for everyone.
+HASHING_MAX_WORKERS = int(os.getenv("HASHING_MAX_WORKERS", min(4, os.cpu_count() or 1)))
+HASHING_MAX_PENDING = int(os.getenv("HASHING_MAX_PENDING", 16))
+HASHING_RETRY_AFTER_SECONDS = 1
+
+_hashing_executor = ThreadPoolExecutor(max_workers=HASHING_MAX_WORKERS, thread_name_prefix="hashing")
+_hashing_slots = threading.BoundedSemaphore(HASHING_MAX_WORKERS + HASHING_MAX_PENDING)
+
+def _submit(fn, *args) -> Future:
+    if not _hashing_slots.acquire(blocking=False):
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many password operations in progress. Try again later.",
+            headers={"Retry-After": str(HASHING_RETRY_AFTER_SECONDS)},
+        )
+    future = _hashing_executor.submit(fn, *args)
+    future.add_done_callback(lambda _: _hashing_slots.release())
+    return future
+
 def hash_string(plain_string:str)->str:
-    return pwd_context.hash(plain_string)
+    return _submit(pwd_context.hash, plain_string).result()
 
 def verify(plain_string:str, hashed_string:str) -> bool:
-    return pwd_context.verify(plain_string, hashed_string)
\ No newline at end of file
+    return _submit(pwd_context.verify, plain_string, hashed_string).result()
+
+# For async handlers: awaiting the future keeps the request off AnyIO's shared
+# threadpool while bcrypt runs, instead of parking a thread on .result().
+async def hash_string_async(plain_string:str)->str:
+    return await asyncio.wrap_future(_submit(pwd_context.hash, plain_string))
+
+async def verify_async(plain_string:str, hashed_string:str) -> bool:
+    return await asyncio.wrap_future(_submit(pwd_context.verify, plain_string, hashed_string))
@@ -1,20 +1,26 @@
 from jose import JWTError, jwt
 from datetime import datetime, timedelta, timezone
+import hashlib
+import time
 from app.schemas.token_schemas import TokenData, Token
-from app.schemas.users_schemas import BasePermission
 from fastapi import Depends, status, HTTPException, Request
 from fastapi.routing import APIRoute
 from fastapi.security import OAuth2PasswordBearer
 from app.database.database import get_db
 from app.database.models import Users
 from sqlalchemy.orm import Session
-from app.auth.auth_utils import extract_permissions, find_permission_by_name
-from typing import List
+from app.auth.auth_utils import permissions_cache, load_active_permission_names, route_permission_names
+from app.cache import TTLCache
 
 SECRET_KEY = "this is my secret key"
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 720
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
+DECODED_TOKENS_STATE_KEY = "decoded_tokens"
+
+VERIFIED_TOKENS_CACHE_MAX_ENTRIES = 4096
+VERIFIED_TOKENS_CACHE_MAX_TTL_SECONDS = 300
+verified_tokens_cache = TTLCache(maxsize=VERIFIED_TOKENS_CACHE_MAX_ENTRIES, ttl=VERIFIED_TOKENS_CACHE_MAX_TTL_SECONDS)
 
 
 def create_access_token(data: dict):
@@ -25,9 +31,45 @@ def create_access_token(data: dict):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-def verify_access_token(token:str, credentials_exception):
+def verify_token_signature(token:str) -> dict:
+    """
+    jwt.decode with a process-wide cache of already verified tokens, keyed by the
+    token's digest. Entries never outlive the token's exp claim; invalid tokens
+    are not cached. Raises JWTError if the token is invalid.
+    """
+    key = hashlib.sha256(token.encode()).digest()
+    payload = verified_tokens_cache.get(key)
+    if payload is not None:
+        return payload
+
+    payload = jwt.decode(token, SECRET_KEY, algorithms=ALGORITHM)
+    ttl = VERIFIED_TOKENS_CACHE_MAX_TTL_SECONDS
+    expires_at = payload.get("exp")
+    if isinstance(expires_at, (int, float)):
+        ttl = min(ttl, expires_at - time.time())
+    if ttl > 0:
+        verified_tokens_cache.set(key, payload, ttl=ttl)
+    return payload
+
+def decode_access_token(token:str, state:dict|None=None) -> dict:
+    """
+    Verifies token and returns its payload. When state (the ASGI scope["state"]) is
+    given the payload is memoized there, so the middleware and get_current_user
+    decode each request's token only once. Raises JWTError if the token is invalid.
+    """
+    if state is None:
+        return verify_token_signature(token)
+
+    decoded_tokens:dict = state.setdefault(DECODED_TOKENS_STATE_KEY, {})
+    payload = decoded_tokens.get(token)
+    if payload is None:
+        payload = verify_token_signature(token)
+        decoded_tokens[token] = payload
+    return payload
+
+def verify_access_token(token:str, credentials_exception, state:dict|None=None):
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=ALGORITHM)
+        payload = decode_access_token(token, state)
         id:str = payload.get("user_id")
 
         if not id:
@@ -39,17 +81,22 @@ def verify_access_token(token:str, credentials_exception):
     
     return token_data
 
-def perform_validations(user:Users, endpoint:str, endpoint_method:str, function_name:str):
+def get_user_permission_names(user:Users, db:Session) -> frozenset[str]:
+    permission_names = permissions_cache.get(user.id)
+    if permission_names is not None:
+        return permission_names
+
     if len(user.roles)==0:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED,detail='User has no roles assigned. Unable to operate')
-    
-    permissions:List[BasePermission] = extract_permissions(user)
-    
-    endpoint_permission = find_permission_by_name(permissions, endpoint)
-    endpoint_method_permission = find_permission_by_name(permissions, endpoint_method)
-    function_permission = find_permission_by_name(permissions, function_name)
 
-    if not endpoint_permission and not endpoint_method_permission and not function_permission:    
+    permission_names = load_active_permission_names(user.id, db)
+    permissions_cache.set(user.id, permission_names)
+    return permission_names
+
+def perform_validations(user:Users, required_permissions:frozenset[str], db:Session):
+    permission_names:frozenset[str] = get_user_permission_names(user, db)
+
+    if required_permissions.isdisjoint(permission_names):
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED,detail='User has no permission for this endpoint, method or function.')
         
     
@@ -63,18 +110,18 @@ def get_current_user(request:Request,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    token:TokenData = verify_access_token(token, credentials_exception)
+    token:TokenData = verify_access_token(token, credentials_exception, request.scope.setdefault("state", {}))
     user = db.query(Users).filter(Users.id == token.id).first()
     
     route = request.scope.get("route")
     
     if isinstance(route, APIRoute):
-        endpoint = route.tags[0] if route.tags else None
-        endpoint_method = f"{endpoint.lower()}_{request.method.lower()}_method" if endpoint else None
-        function_name = route.endpoint.__name__
+        required_permissions = getattr(route, "required_permissions", None)
+        if required_permissions is None:
+            required_permissions = route_permission_names(route)
     else:
-        endpoint = endpoint_method = function_name = None  
+        required_permissions = frozenset()
 
-    perform_validations(user, endpoint, endpoint_method, function_name)
+    perform_validations(user, required_permissions, db)
 
     return user
\ No newline at end of file
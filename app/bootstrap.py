@@ -0,0 +1,76 @@
+import os
+import tempfile
+import time
+from contextlib import contextmanager
+from fastapi import FastAPI
+from app.database.database import engine
+from app.database.models import Base
+from app.views.views_creation import create_default_views
+from app.auth.build_permissions import build_permissions
+from app.initialization import initialize_database
+from app.logging import enable_sqlite_logging
+from app.settings import Settings
+
+try:
+    import fcntl
+except ImportError: # Windows: no advisory locks, workers bootstrap concurrently as before
+    fcntl = None
+
+BOOTSTRAP_LOCK_FILE = os.getenv("BOOTSTRAP_LOCK_FILE", os.path.join(tempfile.gettempdir(), "ecommerce_backend_bootstrap.lock"))
+
+@contextmanager
+def bootstrap_lock(path:str = BOOTSTRAP_LOCK_FILE):
+    """
+    Exclusive file lock held while bootstrapping. The first worker does the work; the
+    others wait for it and then find every phase already done, which is cheap.
+    """
+    if fcntl is None:
+        yield
+        return
+
+    with open(path, "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+@contextmanager
+def timed_phase(timings:dict[str, float], name:str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[name] = (time.perf_counter() - start) * 1000
+
+def run_bootstrap(app:FastAPI, settings:Settings|None = None) -> dict[str, float]:
+    """
+    Log sink, then schema, views, permissions and seed data in that order under
+    bootstrap_lock, skipping whatever settings turns off. Every phase is idempotent.
+    Returns the milliseconds spent in each phase that ran.
+    """
+    settings = settings or Settings()
+    timings:dict[str, float] = {}
+    if settings.sqlite_logging:
+        with timed_phase(timings, "logging"):
+            enable_sqlite_logging()
+
+    database_phases = [
+        ("schema", settings.create_schema, lambda: Base.metadata.create_all(bind=engine)),
+        ("views", settings.sync_views, create_default_views),
+        ("permissions", settings.build_permissions, lambda: build_permissions(app)),
+        ("seed", settings.seed_data, initialize_database),
+    ]
+    database_phases = [(name, run) for name, enabled, run in database_phases if enabled]
+    if not database_phases:
+        return timings
+
+    start = time.perf_counter()
+    with bootstrap_lock():
+        timings["lock_wait"] = (time.perf_counter() - start) * 1000
+        for name, run in database_phases:
+            with timed_phase(timings, name):
+                run()
+
+    print("Bootstrap finished: " + ", ".join(f"{phase} {ms:.1f}ms" for phase, ms in timings.items()))
+    return timings
@@ -0,0 +1,67 @@
+import argparse
+import time
+
+# Imports live inside the commands so that profile-startup measures app.main's
+# import cost instead of finding it already paid for by this module.
+
+def rebuild_store_stats_command(args:argparse.Namespace) -> None:
+    from app.database.database import SessionLocal
+    from app.database.models.stats_models import rebuild_store_stats
+
+    db = SessionLocal()
+    try:
+        rebuild_store_stats(db)
+        print("Store stats rebuilt from the source tables.")
+    finally:
+        db.close()
+
+def sync_views_command(args:argparse.Namespace) -> None:
+    from app.database.database import engine
+    from app.database.models import Base
+    from app.views.views_creation import create_default_views
+
+    Base.metadata.create_all(bind=engine)
+    create_default_views()
+    print("Database views are up to date.")
+
+def profile_startup_command(args:argparse.Namespace) -> None:
+    start = time.perf_counter()
+    from app.main import create_app
+    from app.bootstrap import run_bootstrap
+    from app.settings import Settings
+    timings = {"import app.main": (time.perf_counter() - start) * 1000}
+
+    settings = Settings.from_env()
+    start = time.perf_counter()
+    app = create_app(settings)
+    timings["create_app"] = (time.perf_counter() - start) * 1000
+
+    for phase, ms in run_bootstrap(app, settings).items():
+        timings[f"bootstrap.{phase}"] = ms
+
+    width = max(len(name) for name in timings)
+    for name, ms in timings.items():
+        print(f"{name:<{width}}  {ms:9.1f} ms")
+    print(f"{'total':<{width}}  {sum(timings.values()):9.1f} ms")
+
+def main(argv:list[str]|None = None) -> None:
+    """
+    Maintenance commands, e.g. `python -m app.cli rebuild-store-stats`.
+    """
+    parser = argparse.ArgumentParser(prog="python -m app.cli")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    rebuild_parser = subparsers.add_parser("rebuild-store-stats", help="Recompute the store_stats counters from scratch")
+    rebuild_parser.set_defaults(handler=rebuild_store_stats_command)
+
+    views_parser = subparsers.add_parser("sync-views", help="Create missing tables and recreate views whose definition changed")
+    views_parser.set_defaults(handler=sync_views_command)
+
+    profile_parser = subparsers.add_parser("profile-startup", help="Time the app.main import, create_app and each bootstrap phase (STARTUP_* env vars apply)")
+    profile_parser.set_defaults(handler=profile_startup_command)
+
+    args = parser.parse_args(argv)
+    args.handler(args)
+
+if __name__ == "__main__":
+    main()
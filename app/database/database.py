@@ -1,26 +1,129 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+import os
+import time
+from fastapi import Request
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import StaticPool
 
 #DATABASE_URL = "sqlite:///./app.db"
-DATABASE_URL = "sqlite:///./app/app.db"
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./app/app.db")
+# Replica used for GET requests. Defaults to the primary, opened read-only.
+DATABASE_READ_URL = os.getenv("DATABASE_READ_URL", DATABASE_URL)
 
+# Per-connection SQLite tuning. WAL lets readers run while a writer holds the lock,
+# which is what the 4 uvicorn workers were tripping over ("database is locked").
+SQLITE_JOURNAL_MODE = os.getenv("SQLITE_JOURNAL_MODE", "WAL")
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", 30000))
+SQLITE_CACHE_SIZE_KIB = int(os.getenv("SQLITE_CACHE_SIZE_KIB", 65536))
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", 268435456))
+SQLITE_TEMP_STORE = os.getenv("SQLITE_TEMP_STORE", "MEMORY")
 
-engine = create_engine(
-    DATABASE_URL,
-    connect_args={
-        "check_same_thread": False,
-        "timeout": 30
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 5))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 10))
+DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", 30))
+DB_READ_POOL_SIZE = int(os.getenv("DB_READ_POOL_SIZE", 10))
+DB_READ_MAX_OVERFLOW = int(os.getenv("DB_READ_MAX_OVERFLOW", 20))
+
+READ_REPLICA_CONFIGURED = DATABASE_READ_URL != DATABASE_URL
+
+# Request state set around commits and by ReadYourWritesMiddleware, which turns the
+# commit time into a signed cookie and, on later requests, the cookie back into a pin
+LAST_WRITE_STATE_KEY = "last_write_at"
+READS_PINNED_STATE_KEY = "reads_pinned_to_primary"
+READ_ROUTED_METHODS = frozenset({"GET", "HEAD"})
+
+
+def _apply_sqlite_pragmas(dbapi_connection, read_only:bool):
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+        if not read_only:
+            cursor.execute(f"PRAGMA journal_mode={SQLITE_JOURNAL_MODE}")
+        cursor.execute(f"PRAGMA synchronous={SQLITE_SYNCHRONOUS}")
+        cursor.execute(f"PRAGMA cache_size=-{SQLITE_CACHE_SIZE_KIB}")
+        cursor.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}")
+        cursor.execute(f"PRAGMA temp_store={SQLITE_TEMP_STORE}")
+        if read_only:
+            cursor.execute("PRAGMA query_only=ON")
+    finally:
+        cursor.close()
+
+def is_sqlite_memory_url(url:str) -> bool:
+    url = make_url(url)
+    return url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:")
+
+def create_db_engine(url:str=DATABASE_URL, read_only:bool=False) -> Engine:
+    """
+    Builds an engine for url. SQLite connections get the pragmas above on connect;
+    read_only engines use their own, larger pool and refuse writes (query_only).
+    In-memory SQLite databases live in a single connection, so they get a StaticPool
+    shared by every thread instead of a sized pool.
+    """
+    pool_options = {
+        "pool_size": DB_READ_POOL_SIZE if read_only else DB_POOL_SIZE,
+        "max_overflow": DB_READ_MAX_OVERFLOW if read_only else DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
     }
-)
+    if make_url(url).get_backend_name() != "sqlite":
+        return create_engine(url, pool_pre_ping=True, **pool_options)
+
+    if is_sqlite_memory_url(url):
+        pool_options = {"poolclass": StaticPool}
+
+    new_engine = create_engine(
+        url,
+        connect_args={
+            "check_same_thread": False,
+            "timeout": SQLITE_BUSY_TIMEOUT_MS / 1000
+        },
+        **pool_options
+    )
+
+    @event.listens_for(new_engine, "connect")
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        _apply_sqlite_pragmas(dbapi_connection, read_only)
+
+    return new_engine
+
+
+engine = create_db_engine(DATABASE_URL)
+read_engine = create_db_engine(DATABASE_READ_URL, read_only=True)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
 
 #Session = sessionmaker(engine)
 
-def get_db():
+@event.listens_for(SessionLocal, "after_commit")
+def pin_reads_to_primary(session:Session):
+    state = session.info.get("request_state")
+    if state is not None and READ_REPLICA_CONFIGURED:
+        state[LAST_WRITE_STATE_KEY] = time.time()
+
+def get_db(request:Request = None):
+    """
+    Session for the current request. GET/HEAD requests read from the replica unless
+    ReadYourWritesMiddleware pinned the client to the primary after a recent write;
+    everything else (and callers outside a request) uses the primary.
+    """
+    if (request is not None and request.method in READ_ROUTED_METHODS
+            and not request.scope.get("state", {}).get(READS_PINNED_STATE_KEY)):
+        yield from get_read_db()
+        return
+
     db = SessionLocal()
+    if request is not None:
+        db.info["request_state"] = request.scope.setdefault("state", {})
     try:
         yield db
     finally:
         db.close()
 
+def get_read_db():
+    db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
@@ -5,9 +5,12 @@ from .orders_models import Orders, OrderProducts
 from .stores_models import Stores
 from .users_models import Users, Roles, Permissions, UserRoles, RolePermissions, UserStores
 from .leads_models import Leads
+from .stats_models import StoreStats
+from .views_models import ViewVersions
+from .cache_models import CacheGenerations
 
 
 
 __all__ = ["Base", "Products", "Orders", "OrderProducts", "Customers", "Stores",
            "Users", "Roles", "Permissions", "UserRoles", "RolePermissions", "UserStores",
-           "Leads"]
\ No newline at end of file
+           "Leads", "StoreStats", "ViewVersions", "CacheGenerations"]
\ No newline at end of file
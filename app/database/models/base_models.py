@@ -1,14 +1,22 @@
+from datetime import datetime, timezone
 from sqlalchemy.orm import DeclarativeBase, declared_attr
-from sqlalchemy import Column, DateTime, func
+from sqlalchemy import Column, DateTime
+
+def utc_now() -> datetime:
+    """
+    Naive UTC, like SQLite's CURRENT_TIMESTAMP, but with microseconds: updated_at is
+    part of the HTTP validators and two writes within a second must not share it.
+    """
+    return datetime.now(timezone.utc).replace(tzinfo=None)
 
 class TimestampMixin:
     @declared_attr
     def created_at(cls):
-        return Column(DateTime, default=func.now())
+        return Column(DateTime, default=utc_now)
     
     @declared_attr
     def updated_at(cls):
-        return Column(DateTime, default=func.now(), onupdate=func.now())
+        return Column(DateTime, default=utc_now, onupdate=utc_now)
 
 
 class Base(DeclarativeBase, TimestampMixin):
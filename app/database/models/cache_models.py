@@ -0,0 +1,43 @@
+from sqlalchemy import Column, Integer, String, select, update
+from sqlalchemy.dialects import sqlite, postgresql
+from sqlalchemy.orm import Session
+from .base_models import Base
+
+class CacheGenerations(Base):
+    """
+    Generation number per response cache. Writes bump it in their own transaction and
+    readers put it in their cache keys, so a write on one uvicorn worker retires the
+    entries every worker holds without any cross-process messaging.
+    """
+    __tablename__ = "cache_generations"
+
+    name = Column(String, primary_key=True)
+    generation = Column(Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'CacheGenerations(name={self.name}, generation={self.generation})'
+
+
+_UPSERT_DIALECTS = {"sqlite": sqlite.insert, "postgresql": postgresql.insert}
+
+def cache_generation(db:Session, name:str) -> int:
+    return db.execute(select(CacheGenerations.generation).where(CacheGenerations.name == name)).scalar() or 0
+
+def bump_cache_generation(db:Session, name:str) -> None:
+    """
+    Increments the generation inside the caller's transaction; it becomes visible to
+    other workers when that transaction commits, together with the data it covers.
+    """
+    table = CacheGenerations.__table__
+    insert = _UPSERT_DIALECTS.get(db.get_bind().dialect.name)
+    if insert is not None:
+        db.execute(
+            insert(table)
+            .values(name=name, generation=1)
+            .on_conflict_do_update(index_elements=[table.c.name], set_={"generation": table.c.generation + 1})
+        )
+        return
+
+    result = db.execute(update(table).where(table.c.name == name).values(generation=table.c.generation + 1))
+    if result.rowcount == 0:
+        db.execute(table.insert().values(name=name, generation=1))
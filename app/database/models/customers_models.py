@@ -1,12 +1,17 @@
 import uuid
 from sqlalchemy.orm import Mapped, mapped_column, relationship
-from sqlalchemy import Column, ForeignKey, String
+from sqlalchemy import Column, ForeignKey, String, Index
 from typing import List
 from .base_models import Base
 
 class Customers(Base):
     __tablename__ = 'customers'
-    __table_args__ = {'extend_existing': True}
+    __table_args__ = (
+        Index('ix_customers_store_id_created_at', 'store_id', 'created_at', 'id'),
+        Index('ix_customers_store_id_name', 'store_id', 'name', 'id'),
+        Index('ix_customers_store_id_email', 'store_id', 'email', 'id'),
+        {'extend_existing': True},
+    )
     id: Mapped[str] = mapped_column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
     name: Mapped[str] = mapped_column(String)
     email: Mapped[str] = mapped_column(String)
@@ -8,10 +8,10 @@ class Leads(Base):
     __tablename__ = "leads"
     
     id: Mapped[str] = mapped_column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
-    store_id: Mapped[str] = mapped_column(String, ForeignKey('stores.id'), nullable=False)
-    customer_id: Mapped[str] = mapped_column(String, ForeignKey('customers.id'), nullable=False)
-    product_id: Mapped[str] = mapped_column(String, ForeignKey('products.id'), nullable=False)
-    order_id: Mapped[str] = mapped_column(String, ForeignKey('orders.id'))
+    store_id: Mapped[str] = mapped_column(String, ForeignKey('stores.id'), nullable=False, index=True)
+    customer_id: Mapped[str] = mapped_column(String, ForeignKey('customers.id'), nullable=False, index=True)
+    product_id: Mapped[str] = mapped_column(String, ForeignKey('products.id'), nullable=False, index=True)
+    order_id: Mapped[str] = mapped_column(String, ForeignKey('orders.id'), index=True)
     
     product_quantity: Mapped[Integer] = mapped_column(Integer, nullable=False)
 
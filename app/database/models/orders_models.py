@@ -1,6 +1,6 @@
 import uuid
 from sqlalchemy.orm import Mapped, mapped_column, relationship
-from sqlalchemy import String, ForeignKey, Float, Integer, Column
+from sqlalchemy import String, ForeignKey, Float, Integer, Column, Index
 from typing import List
 from .base_models import Base
 
@@ -9,8 +9,8 @@ class OrderProducts(Base):
     __tablename__ = 'order_products'
     __table_args__ = {'extend_existing': True}
     id: Mapped[str] = mapped_column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
-    order_id: Mapped[str] = mapped_column(String, ForeignKey('orders.id'))
-    product_id: Mapped[str] = mapped_column(String, ForeignKey('products.id'))
+    order_id: Mapped[str] = mapped_column(String, ForeignKey('orders.id'), index=True)
+    product_id: Mapped[str] = mapped_column(String, ForeignKey('products.id'), index=True)
 
     price: Mapped[Float] = mapped_column(Float)
     quantity: Mapped[Integer] = mapped_column(Integer)
@@ -22,9 +22,13 @@ class OrderProducts(Base):
 
 class Orders(Base):
     __tablename__ = 'orders'
-    __table_args__ = {'extend_existing': True}
+    __table_args__ = (
+        Index('ix_orders_store_id_created_at', 'store_id', 'created_at', 'id'),
+        Index('ix_orders_store_id_total', 'store_id', 'total', 'id'),
+        {'extend_existing': True},
+    )
     id: Mapped[str] = mapped_column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
-    customer_id: Mapped[str] = mapped_column(String, ForeignKey('customers.id'))
+    customer_id: Mapped[str] = mapped_column(String, ForeignKey('customers.id'), index=True)
     store_id = Column(String, ForeignKey("stores.id"), nullable=False)
     
     
@@ -1,12 +1,19 @@
 import uuid
 from sqlalchemy.orm import Mapped, relationship, mapped_column
-from sqlalchemy import Column, String, Float, Integer, ForeignKey
+from sqlalchemy import Column, String, Float, Integer, ForeignKey, Index
 from .base_models import Base
 from typing import List
 
 class Products(Base):
     __tablename__ = 'products'
-    __table_args__ = {'extend_existing': True}
+    # (store_id, sort column, id) serves both the store filter and the listing order, id being the keyset tiebreaker
+    __table_args__ = (
+        Index('ix_products_store_id_created_at', 'store_id', 'created_at', 'id'),
+        Index('ix_products_store_id_name', 'store_id', 'name', 'id'),
+        Index('ix_products_store_id_price', 'store_id', 'price', 'id'),
+        Index('ix_products_store_id_stock', 'store_id', 'stock', 'id'),
+        {'extend_existing': True},
+    )
     id: Mapped[str] = mapped_column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
     name: Mapped[str] = mapped_column(String)
     price: Mapped[Float] = mapped_column(Float)
@@ -0,0 +1,114 @@
+from sqlalchemy import Column, ForeignKey, Integer, String, case, event, func, select, update
+from sqlalchemy.dialects import sqlite, postgresql
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Mapper, Session
+from .base_models import Base, utc_now
+from .products_models import Products
+from .customers_models import Customers
+from .orders_models import Orders
+from .users_models import Roles
+from .stores_models import Stores
+
+class StoreStats(Base):
+    """
+    Row count per (store, table), kept up to date by the ORM insert/delete events below.
+    Bulk query.delete() calls bypass those events, so treat the numbers as estimates
+    and use rebuild_store_stats to resynchronize them.
+    """
+    __tablename__ = "store_stats"
+
+    store_id = Column(String, ForeignKey('stores.id'), primary_key=True)
+    entity = Column(String, primary_key=True)
+    row_count = Column(Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'StoreStats(store_id={self.store_id}, entity={self.entity}, row_count={self.row_count})'
+
+
+STORE_STATS_MODELS = (Products, Customers, Orders, Roles)
+STORE_STATS_ENTITIES = frozenset(model.__tablename__ for model in STORE_STATS_MODELS)
+
+_UPSERT_DIALECTS = {"sqlite": sqlite.insert, "postgresql": postgresql.insert}
+
+def increment_store_stat(connection:Connection, store_id:str, entity:str, delta:int) -> None:
+    table = StoreStats.__table__
+    insert = _UPSERT_DIALECTS.get(connection.dialect.name)
+    if insert is not None:
+        statement = (
+            insert(table)
+            .values(store_id=store_id, entity=entity, row_count=max(delta, 0))
+            .on_conflict_do_update(
+                index_elements=[table.c.store_id, table.c.entity],
+                set_={"row_count": table.c.row_count + delta, "updated_at": utc_now()},
+            )
+        )
+        connection.execute(statement)
+        return
+
+    result = connection.execute(
+        update(table)
+        .where(table.c.store_id == store_id, table.c.entity == entity)
+        .values(row_count=table.c.row_count + delta)
+    )
+    if result.rowcount == 0:
+        connection.execute(table.insert().values(store_id=store_id, entity=entity, row_count=max(delta, 0)))
+
+def _count_insert(mapper:Mapper, connection:Connection, target) -> None:
+    if target.store_id:
+        increment_store_stat(connection, target.store_id, mapper.local_table.name, 1)
+
+def _count_delete(mapper:Mapper, connection:Connection, target) -> None:
+    if target.store_id:
+        increment_store_stat(connection, target.store_id, mapper.local_table.name, -1)
+
+for _model in STORE_STATS_MODELS:
+    event.listen(_model, "after_insert", _count_insert)
+    event.listen(_model, "after_delete", _count_delete)
+
+
+def rebuild_store_stats(db:Session) -> None:
+    """
+    Recomputes every counter from the source tables in a single transaction.
+    """
+    db.query(StoreStats).delete(synchronize_session=False)
+    for model in STORE_STATS_MODELS:
+        counts = (
+            db.query(model.store_id, func.count(model.id))
+            .filter(model.store_id.is_not(None))
+            .group_by(model.store_id)
+            .all()
+        )
+        db.add_all(
+            StoreStats(store_id=store_id, entity=model.__tablename__, row_count=row_count)
+            for store_id, row_count in counts
+        )
+    db.commit()
+
+def estimate_store_count(db:Session, entity:str, store_ids:set[str]|None) -> int:
+    """
+    Sums the maintained counters for entity over store_ids (every store when None).
+    """
+    query = select(func.coalesce(func.sum(StoreStats.row_count), 0)).where(StoreStats.entity == entity)
+    if store_ids is not None:
+        query = query.where(StoreStats.store_id.in_(store_ids))
+    return db.execute(query).scalar_one()
+
+def store_stats_summary(db:Session, store_ids:set[str]|None) -> list:
+    """
+    One row per store with its counters pivoted into <entity>_count columns. Reads
+    store_stats only, so the cost grows with the number of stores, not of orders.
+    """
+    counters = [
+        func.coalesce(func.sum(case((StoreStats.entity == model.__tablename__, StoreStats.row_count))), 0)
+        .label(f"{model.__tablename__}_count")
+        for model in STORE_STATS_MODELS
+    ]
+    query = (
+        select(Stores.id.label("store_id"), Stores.name, *counters)
+        .outerjoin(StoreStats, StoreStats.store_id == Stores.id)
+        .group_by(Stores.id, Stores.name)
+        .order_by(Stores.name)
+    )
+    if store_ids is not None:
+        query = query.where(Stores.id.in_(store_ids))
+    return db.execute(query).mappings().all()
@@ -8,8 +8,8 @@ class UserStores(Base) :
     __tablename__ = "user_stores"
 
     id: Mapped[str] = mapped_column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
-    user_id = Column(String, ForeignKey('users.id'))
-    store_id = Column(String, ForeignKey('stores.id'))
+    user_id = Column(String, ForeignKey('users.id'), index=True)
+    store_id = Column(String, ForeignKey('stores.id'), index=True)
 
     user = relationship("Users", back_populates="user_stores")
     store = relationship("Stores", back_populates="user_stores")
@@ -38,7 +38,7 @@ class Roles(Base):
     
     id: Mapped[str] = mapped_column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
     name = Column(String, nullable=False)
-    store_id = Column(String, ForeignKey('stores.id'))
+    store_id = Column(String, ForeignKey('stores.id'), index=True)
 
     users: Mapped[List['UserRoles']] = relationship('UserRoles', back_populates='role')
     permissions: Mapped[List['RolePermissions']] = relationship('RolePermissions', back_populates='role')
@@ -64,8 +64,8 @@ class RolePermissions(Base):
     __tablename__ = "role_permissions"
     __table_args__ = {'extend_existing': True}
     id: Mapped[str] = mapped_column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
-    role_id = Column(String, ForeignKey('roles.id'))
-    permission_id = Column(String, ForeignKey('permissions.id'))
+    role_id = Column(String, ForeignKey('roles.id'), index=True)
+    permission_id = Column(String, ForeignKey('permissions.id'), index=True)
 
     
     role = relationship("Roles", back_populates="permissions")
@@ -78,8 +78,8 @@ class UserRoles(Base):
     __tablename__ = 'user_roles'
     __table_args__ = {'extend_existing': True}
     id: Mapped[str] = mapped_column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
-    user_id: Mapped[str] = mapped_column(String, ForeignKey('users.id'))
-    role_id: Mapped[str] = mapped_column(String, ForeignKey('roles.id'))
+    user_id: Mapped[str] = mapped_column(String, ForeignKey('users.id'), index=True)
+    role_id: Mapped[str] = mapped_column(String, ForeignKey('roles.id'), index=True)
     
     user = relationship("Users", back_populates="roles")
     role = relationship("Roles", back_populates="users")
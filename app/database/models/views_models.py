@@ -0,0 +1,15 @@
+from sqlalchemy import Column, String
+from .base_models import Base
+
+class ViewVersions(Base):
+    """
+    Definition hash of every database view created by app.views, so unchanged
+    views are not dropped and recreated on each start.
+    """
+    __tablename__ = "view_versions"
+
+    name = Column(String, primary_key=True)
+    definition_hash = Column(String, nullable=False)
+
+    def __repr__(self):
+        return f'ViewVersions(name={self.name}, definition_hash={self.definition_hash})'
@@ -2,6 +2,41 @@ from sqlalchemy.orm import Session
 from app.database.database import get_db
 from app.database.models import *
 from app.auth.hashing import hash_string
+from app.database.models.stats_models import rebuild_store_stats
+
+def link_missing_role_permissions(role:Roles, db:Session) -> int:
+    """
+    Links every permission the role doesn't have yet, computed as a set difference
+    in two queries instead of one existence check per permission.
+    """
+    linked_ids = {permission_id for (permission_id,) in db.query(RolePermissions.permission_id).filter(RolePermissions.role_id == role.id)}
+    missing_ids = [permission_id for (permission_id,) in db.query(Permissions.id) if permission_id not in linked_ids]
+    db.add_all(RolePermissions(role_id=role.id, permission_id=permission_id) for permission_id in missing_ids)
+    return len(missing_ids)
+
+def get_global_admin_role(db:Session) -> Roles|None:
+    """
+    The admin role created with the admin user. Only the global one (no store_id):
+    tenants may name their own roles "admin" too.
+    """
+    return db.query(Roles).filter(Roles.name == "admin", Roles.store_id.is_(None)).first()
+
+def sync_admin_role_permissions(db:Session) -> None:
+    """
+    Grants the admin role any permission created after it, e.g. for new endpoints.
+    """
+    try:
+        admin_role = get_global_admin_role(db)
+        if not admin_role:
+            return
+
+        linked = link_missing_role_permissions(admin_role, db)
+        if linked > 0:
+            db.commit()
+            print(f"Linked {linked} new permission(s) to the admin role.")
+    except Exception as e:
+        db.rollback()
+        print(f"An error occurred during database initialization: {e}")
 
 def create_admin_user(check_existing_users:bool, db:Session) -> None:
     """
@@ -42,33 +77,19 @@ def create_admin_user(check_existing_users:bool, db:Session) -> None:
         # We need to flush to get the admin_user.id for relationships
         db.flush()
 
-        # 2. Get all permissions
-        all_permissions = db.query(Permissions).all()
-        if not all_permissions:
-            print("Warning: No permissions found in the database. Admin user will have no permissions initially.")
-            # Consider running build_permissions first if this happens often
-
-        # 3. Create admin role
-        admin_role = db.query(Roles).filter(Roles.name == "admin").first()
+        # 2. Create admin role
+        admin_role = get_global_admin_role(db)
         if not admin_role:
             admin_role = Roles(name="admin")
             db.add(admin_role)
             db.flush() # Flush to get admin_role.id
 
-        # 4. Assign all permissions to admin role
-        role_permissions_links = []
-        for perm in all_permissions:
-            # Check if the link already exists (optional, for idempotency)
-            existing_link = db.query(RolePermissions).filter_by(role_id=admin_role.id, permission_id=perm.id).first()
-            if not existing_link:
-                role_permissions_links.append(
-                    RolePermissions(role_id=admin_role.id, permission_id=perm.id)
-                )
-
-        if role_permissions_links:
-            db.add_all(role_permissions_links)
+        # 3. Assign all permissions to admin role
+        if link_missing_role_permissions(admin_role, db) == 0 and db.query(Permissions.id).first() is None:
+            print("Warning: No permissions found in the database. Admin user will have no permissions initially.")
+            # Consider running build_permissions first if this happens often
 
-        # 5. Assign admin role to admin user
+        # 4. Assign admin role to admin user
         # Check if the link already exists (optional, for idempotency)
         existing_user_role = db.query(UserRoles).filter_by(user_id=admin_user.id, role_id=admin_role.id).first()
         if not existing_user_role:
@@ -83,6 +104,21 @@ def create_admin_user(check_existing_users:bool, db:Session) -> None:
         db.rollback()
         print(f"An error occurred during database initialization: {e}")
 
+def initialize_store_stats(db:Session) -> None:
+    """
+    Seeds the store_stats counters from the existing rows when the table is empty,
+    e.g. on a database created before the table existed.
+    """
+    try:
+        if db.query(StoreStats).first() is not None:
+            return
+
+        print("Store stats are empty. Rebuilding them from existing data...")
+        rebuild_store_stats(db)
+    except Exception as e:
+        print(f"An error occurred during database initialization: {e}")
+        db.rollback()
+
 def create_base_store(db:Session) -> str:
     """
     Creates a base store if no stores exist in the database.
@@ -202,6 +238,8 @@ def initialize_database(check_existing_users: bool = True):
     db: Session = next(get_db())
     try:
         create_admin_user(check_existing_users, db)
+        sync_admin_role_permissions(db)
+        initialize_store_stats(db)
         base_store_id:str = create_base_store(db)
         base_customer_id:str = create_base_customer(db, base_store_id)
         base_product_id:str = create_base_product(db, base_store_id)
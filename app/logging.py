@@ -1,21 +1,52 @@
-import sys, sqlite3, json, atexit
+import sys, os, sqlite3, json, atexit, queue, threading, time
 from loguru import logger
 
 DB_FILE = "mi_aplicacion_logs.db"
 
+STDOUT_LOG_LEVEL = os.getenv("LOG_LEVEL", "DEBUG")
+SQLITE_LOG_LEVEL = "INFO"
+
+LOG_QUEUE_MAX_SIZE = 10000
+LOG_BATCH_SIZE = 200
+LOG_FLUSH_INTERVAL_SECONDS = 1.0
+
+INSERT_LOG_QUERY = """
+    INSERT INTO logs (timestamp, level_name, level_no, message, module, funcName, line, extra)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+_STOP = object()
+
 class SQLiteSink:
-    def __init__(self, db_path):
+    """
+    Sink de loguru que encola los registros y los escribe en SQLite desde un hilo dedicado,
+    en lotes (por cantidad o por tiempo) y con la base en modo WAL.
+    Con la cola llena descarta el registro (block_when_full=False) o espera a que haya lugar.
+    """
+    def __init__(self, db_path, max_queue_size=LOG_QUEUE_MAX_SIZE, batch_size=LOG_BATCH_SIZE,
+                 flush_interval=LOG_FLUSH_INTERVAL_SECONDS, block_when_full=False):
         self.db_path = db_path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.block_when_full = block_when_full
         self.conn = None
         self.cursor = None
-        self._connect()
-        self._setup_table()
+        self.dropped_records = 0
+        self.flushed_records = 0
+        self.failed_records = 0
+        self._queue = queue.Queue(maxsize=max_queue_size)
+        self._ready = threading.Event()
+        self._writer = threading.Thread(target=self._run, name="sqlite-log-writer", daemon=True)
+        self._writer.start()
+        self._ready.wait()
         atexit.register(self.close)
 
     def _connect(self):
-        """Establece la conexión con la base de datos."""
+        """Establece la conexión con la base de datos. Solo la usa el hilo escritor."""
         try:
-            self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            self.conn = sqlite3.connect(self.db_path)
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("PRAGMA synchronous=NORMAL")
             self.cursor = self.conn.cursor()
             #print(f"Conectado a la base de datos SQLite: {self.db_path}")
         except sqlite3.Error as e:
@@ -44,50 +75,97 @@ class SQLiteSink:
         except sqlite3.Error as e:
             print(f"Error al crear/verificar la tabla 'logs': {e}", file=sys.stderr)
 
-    def write(self, message):
+    def _flush(self, batch):
+        """Escribe un lote de registros con un único executemany y commit."""
+        if not batch:
+            return
         if not self.conn or not self.cursor:
             print("Saltando log a SQLite: No hay conexión a la base de datos.", file=sys.stderr)
+            self.failed_records += len(batch)
             return
         try:
-            # Parsea el registro JSON enviado por Loguru
-            record = json.loads(message)['record']
-
-            log_entry = {
-                'timestamp': record['time']['repr'],
-                'level_name': record['level']['name'],
-                'level_no': record['level']['no'],
-                'message': record['message'],
-                'module': record['module'],
-                'funcName': record['function'],
-                'line': record['line'],
-                'extra': json.dumps(record.get('extra', {}))
-            }
-            self.cursor.execute("""
-                INSERT INTO logs (timestamp, level_name, level_no, message, module, funcName, line, extra)
-                VALUES (:timestamp, :level_name, :level_no, :message, :module, :funcName, :line, :extra)
-            """, log_entry)
+            rows = [entry[:-1] + (json.dumps(entry[-1], default=str),) for entry in batch]
+            self.cursor.executemany(INSERT_LOG_QUERY, rows)
             self.conn.commit()
-
-        except json.JSONDecodeError as e:
-            print(f"Error al decodificar el mensaje JSON del log: {e}", file=sys.stderr)
-            print(f"Data recibida: {message}", file=sys.stderr)
+            self.flushed_records += len(batch)
         except sqlite3.Error as e:
             print(f"Error al escribir log en SQLite DB: {e}", file=sys.stderr)
-            # try: self.conn.rollback() except: pass
+            self.failed_records += len(batch)
+            try: self.conn.rollback()
+            except sqlite3.Error: pass
         except Exception as e:
             print(f"Error inesperado en SQLiteSink: {e}", file=sys.stderr)
+            self.failed_records += len(batch)
+
+    def _run(self):
+        """Bucle del hilo escritor: junta registros hasta llenar un lote o cumplir el intervalo."""
+        self._connect()
+        self._setup_table()
+        self._ready.set()
+
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+        while True:
+            try:
+                entry = self._queue.get(timeout=max(deadline - time.monotonic(), 0))
+            except queue.Empty:
+                entry = None
+
+            if entry is _STOP:
+                self._flush(batch)
+                break
+            if entry is not None:
+                batch.append(entry)
+
+            if len(batch) >= self.batch_size or time.monotonic() >= deadline:
+                self._flush(batch)
+                batch = []
+                deadline = time.monotonic() + self.flush_interval
 
-    def close(self):
-        """Cierra la conexión a la base de datos."""
         if self.conn:
             try:
-                self.conn.commit()
                 self.conn.close()
                 print(f"Conexión SQLite '{self.db_path}' cerrada.")
-                self.conn = None
-                self.cursor = None
             except sqlite3.Error as e:
                 print(f"Error al cerrar la conexión SQLite: {e}", file=sys.stderr)
+            self.conn = None
+            self.cursor = None
+
+    def write(self, message):
+        """Encola el registro. No toca la base de datos en el hilo que loguea."""
+        record = message.record
+        entry = (
+            str(record['time']),
+            record['level'].name,
+            record['level'].no,
+            record['message'],
+            record['module'],
+            record['function'],
+            record['line'],
+            record['extra'],
+        )
+        try:
+            if self.block_when_full:
+                self._queue.put(entry)
+            else:
+                self._queue.put_nowait(entry)
+        except queue.Full:
+            self.dropped_records += 1
+
+    def stats(self) -> dict:
+        return {
+            "queued": self._queue.qsize(),
+            "flushed": self.flushed_records,
+            "dropped": self.dropped_records,
+            "failed": self.failed_records,
+        }
+
+    def close(self):
+        """Vacía la cola y cierra la conexión a la base de datos."""
+        if not self._writer.is_alive():
+            return
+        self._queue.put(_STOP)
+        self._writer.join()
 
     def __call__(self, message):
         """Hace que la instancia de la clase sea callable para logger.add."""
@@ -95,17 +173,32 @@ class SQLiteSink:
 
 logger.remove()
 logger.add(sys.stdout, 
+           level=STDOUT_LOG_LEVEL,
            colorize=True, 
            format="<green>{time:YYYY/MM/DD - HH:mm:ss}</green> <level>{level: <8}</level> <cyan>{name}</cyan>:<cyan>{function}</cyan>:<cyan>{line}</cyan> - <level>{message}</level>")
 
 child_logger = logger.bind()
 
 
-sqlite_sink = SQLiteSink(DB_FILE)
+# El sink de SQLite abre la base y arranca un hilo, así que se crea recién al iniciar la
+# aplicación (ver enable_sqlite_logging) y no al importar este módulo.
+sqlite_sink:SQLiteSink|None = None
+
+_min_sink_level_no = logger.level(STDOUT_LOG_LEVEL).no
+
+def enable_sqlite_logging(db_path:str = DB_FILE) -> SQLiteSink:
+    """Crea el sink de SQLite y lo agrega al logger la primera vez que se llama."""
+    global sqlite_sink, _min_sink_level_no
+    if sqlite_sink is None:
+        sqlite_sink = SQLiteSink(db_path)
+        child_logger.add(
+            sqlite_sink,
+            level=SQLITE_LOG_LEVEL,
+            catch=False
+        )
+        _min_sink_level_no = min(_min_sink_level_no, logger.level(SQLITE_LOG_LEVEL).no)
+    return sqlite_sink
 
-child_logger.add(
-    sqlite_sink,
-    serialize=True,
-    level="INFO",
-    catch=False
-)
+def is_level_enabled(level:str) -> bool:
+    """Indica si algún sink aceptaría un registro de este nivel, para no armarlo en vano."""
+    return logger.level(level).no >= _min_sink_level_no
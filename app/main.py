@@ -1,48 +1,59 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from app.database.models import Base
-from app.database.database import engine
-from app.views.views_creation import create_default_views
+from fastapi.responses import ORJSONResponse
 from app.routers import products, customers, orders, stores, users, roles, permissions, auth
-from app.auth.build_permissions import build_permissions
-from starlette.middleware.base import BaseHTTPMiddleware
-from app.middleware import log_middleware, add_headers_middleware
-from app.initialization import initialize_database
-
-Base.metadata.create_all(bind=engine)
-create_default_views()
-
-app = FastAPI()
-app.add_middleware(BaseHTTPMiddleware,dispatch=log_middleware)
-app.add_middleware(BaseHTTPMiddleware,dispatch=add_headers_middleware)
+from app.middleware import LogMiddleware, HeadersMiddleware, ReadYourWritesMiddleware
+from app.auth.build_permissions import build_route_permissions_index
+from app.bootstrap import run_bootstrap
+from app.settings import Settings
 
 origins = [
     "*"
 ]
 
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=origins,
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"], 
-    expose_headers=["X-Next-Page", "X-Last-Page"],
-)
-
-app.include_router(products.router)
-app.include_router(customers.router)
-app.include_router(orders.router)
-app.include_router(stores.router)
-app.include_router(users.router)
-app.include_router(roles.router)
-app.include_router(permissions.router)
-app.include_router(auth.router)
-
-build_permissions(app)
-initialize_database()
-
-@app.get("/")
-async def root():
-    return {"message": "Service Running"}
-
-
+def create_app(settings:Settings|None = None) -> FastAPI:
+    """
+    Builds the application without any I/O. Database and log file setup runs in the
+    lifespan hook, once the server starts, and each step can be turned off in settings.
+    """
+    settings = settings or Settings.from_env()
+
+    @asynccontextmanager
+    async def lifespan(app:FastAPI):
+        run_bootstrap(app, settings)
+        yield
+
+    app = FastAPI(lifespan=lifespan, default_response_class=ORJSONResponse)
+    app.add_middleware(LogMiddleware)
+    app.add_middleware(HeadersMiddleware)
+    app.add_middleware(ReadYourWritesMiddleware)
+
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=origins,
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"], 
+        expose_headers=["X-Next-Page", "X-Last-Page"],
+    )
+
+    app.include_router(products.router)
+    app.include_router(customers.router)
+    app.include_router(orders.router)
+    app.include_router(stores.router)
+    app.include_router(users.router)
+    app.include_router(roles.router)
+    app.include_router(permissions.router)
+    app.include_router(auth.router)
+
+    build_route_permissions_index(app)
+
+    @app.get("/")
+    async def root():
+        return {"message": "Service Running"}
+
+    return app
+
+
+app = create_app()
@@ -1,40 +1,137 @@
 from app.logging import child_logger
-from fastapi import Request
-from starlette.responses import Response 
-from app.auth.oauth2 import SECRET_KEY, ALGORITHM
-from jose import jwt, JWTError
-
-async def log_middleware(request:Request, call_next):
-    log_dict = {"url": request.url.path,
-                "method": request.method,
-                "headers": dict(request.headers),
-                "query_params": dict(request.query_params),
-                "status_code": None,
-                }
-    child_logger.bind(**log_dict).debug(f'URL:{log_dict["url"]},  METHOD:{log_dict["method"]}')
-    response:Response = await call_next(request)
-    
-    log_dict["status_code"] = response.status_code,
-    log_dict["headers"] = dict(response.headers)
-    child_logger.bind(**log_dict).debug(f'URL:{log_dict["url"]},  METHOD:{log_dict["method"]}. RESPONSE_CODE:{log_dict["status_code"]}')
-    return response
-
-
-async def add_headers_middleware(request: Request, call_next):
-    user_id = None
-    auth_header = request.headers.get("authorization")
-    token = None
-    if auth_header and auth_header.startswith("Bearer "):
-        token = auth_header.split(" ")[1]
-    if token:
+from app.access_log import access_log_enabled, log_access
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.requests import HTTPConnection
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from app.auth.oauth2 import SECRET_KEY, decode_access_token
+from app.database.database import LAST_WRITE_STATE_KEY, READS_PINNED_STATE_KEY
+from jose import JWTError
+import hashlib
+import hmac
+import math
+import os
+import time
+
+# After a client commits, its reads go to the primary for this long so it sees its
+# own writes while the replica catches up. The pin travels with the client as a
+# cookie, so it holds whichever worker serves the next request.
+READ_YOUR_WRITES_SECONDS = float(os.getenv("READ_YOUR_WRITES_SECONDS", 5))
+READ_YOUR_WRITES_COOKIE = "last_write"
+# Signing key derived from the JWT secret: forging a pin is as hard as forging a token
+READ_YOUR_WRITES_KEY = hmac.new(SECRET_KEY.encode(), b"read-your-writes", hashlib.sha256).digest()
+
+class LogMiddleware:
+    """
+    Pure ASGI access logger: times the request and reads the status and headers
+    from the response start message, without wrapping the body stream.
+    """
+    def __init__(self, app:ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope:Scope, receive:Receive, send:Send):
+        if scope["type"] != "http" or not access_log_enabled():
+            await self.app(scope, receive, send)
+            return
+
+        response_start:Message = {"status": 500, "headers": []}
+
+        async def send_wrapper(message:Message):
+            nonlocal response_start
+            if message["type"] == "http.response.start":
+                response_start = message
+            await send(message)
+
+        start = time.perf_counter()
         try:
-            payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-            user_id = payload.get("user_id")
-        except JWTError as e:
-            child_logger.warning(f"Error decoding token in middleware: {e}")
-            pass
-
-    response: Response = await call_next(request)
-    if user_id: 
-        response.headers["X-User-ID"] = str(user_id)
-    return response
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            duration_ms = (time.perf_counter() - start) * 1000
+            log_access(scope, Headers(scope=scope), response_start["status"], Headers(raw=response_start["headers"]),
+                       duration_ms, scope.get("state", {}).get("user_id"))
+
+
+class HeadersMiddleware:
+    """
+    Decodes the bearer token once per request, leaving the payload in scope["state"]
+    for get_current_user, and adds the X-User-ID response header.
+    """
+    def __init__(self, app:ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope:Scope, receive:Receive, send:Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        state:dict = scope.setdefault("state", {})
+        user_id = None
+        auth_header = Headers(scope=scope).get("authorization")
+        token = None
+        if auth_header and auth_header.startswith("Bearer "):
+            token = auth_header.split(" ")[1]
+        if token:
+            try:
+                payload = decode_access_token(token, state)
+                user_id = payload.get("user_id")
+            except JWTError as e:
+                child_logger.warning(f"Error decoding token in middleware: {e}")
+                pass
+
+        state["user_id"] = user_id
+        if not user_id:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_wrapper(message:Message):
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message)["X-User-ID"] = str(user_id)
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
+
+
+def last_write_signature(value:str) -> str:
+    return hmac.new(READ_YOUR_WRITES_KEY, value.encode(), hashlib.sha256).hexdigest()[:32]
+
+def last_write_cookie(last_write_at:float) -> str:
+    value = f"{last_write_at:.3f}"
+    return (f"{READ_YOUR_WRITES_COOKIE}={value}.{last_write_signature(value)}; "
+            f"Max-Age={math.ceil(READ_YOUR_WRITES_SECONDS)}; Path=/; HttpOnly; SameSite=Lax")
+
+def last_write_is_recent(cookie:str|None) -> bool:
+    """
+    Whether a last_write cookie is authentic and younger than READ_YOUR_WRITES_SECONDS.
+    """
+    if not cookie:
+        return False
+    value, _, signature = cookie.rpartition(".")
+    if not hmac.compare_digest(signature, last_write_signature(value)):
+        return False
+    try:
+        return 0 <= time.time() - float(value) < READ_YOUR_WRITES_SECONDS
+    except ValueError:
+        return False
+
+class ReadYourWritesMiddleware:
+    """
+    Pins a client's reads to the primary while its signed last_write cookie is recent
+    (see get_db), and sets that cookie on responses to requests that committed on the
+    primary while a replica is configured.
+    """
+    def __init__(self, app:ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope:Scope, receive:Receive, send:Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        state:dict = scope.setdefault("state", {})
+        state[READS_PINNED_STATE_KEY] = last_write_is_recent(HTTPConnection(scope).cookies.get(READ_YOUR_WRITES_COOKIE))
+
+        async def send_wrapper(message:Message):
+            if message["type"] == "http.response.start" and LAST_WRITE_STATE_KEY in state:
+                MutableHeaders(scope=message).append("set-cookie", last_write_cookie(state[LAST_WRITE_STATE_KEY]))
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
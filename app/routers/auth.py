@@ -1,9 +1,11 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from app.database.database import get_db
 from app.database.models import Users
-from app.auth.hashing import verify
+from app.auth.hashing import verify_async
 from app.auth.oauth2 import create_access_token
+from app.auth.auth_utils import login_throttled, record_login_failure, reset_login_failures, LOGIN_THROTTLE_WINDOW_SECONDS
 from fastapi.security.oauth2 import OAuth2PasswordRequestForm
 
 router = APIRouter(
@@ -11,20 +13,43 @@ router = APIRouter(
     tags=['Authentication']
 )
 
+def load_login_credentials(email:str, db:Session) -> tuple[str, str]|None:
+    """
+    (id, password hash) of the user with this email. Closes the session afterwards so
+    the connection goes back to the pool instead of being held while bcrypt runs.
+    """
+    try:
+        return db.query(Users.id, Users.password).filter(Users.email == email).first()
+    finally:
+        db.close()
+
 @router.post("/login")
-async def login(user_credentials: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
-    user_model = db.query(Users).filter(Users.email == user_credentials.username).first()
-    if not user_model:
+async def login(request: Request, user_credentials: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
+    client_host = request.client.host if request.client else None
+    if login_throttled(user_credentials.username, client_host):
+        raise HTTPException(status_code=429, detail="Too many failed login attempts. Try again later.",
+                            headers={"Retry-After": str(LOGIN_THROTTLE_WINDOW_SECONDS)})
+
+    credentials = await run_in_threadpool(load_login_credentials, user_credentials.username, db)
+    if not credentials:
+        record_login_failure(user_credentials.username, client_host)
         raise HTTPException(status_code=403, detail="Invalid Credentials")
-    
+
+    user_id, password_hash = credentials
     try: 
-        if not verify(user_credentials.password, user_model.password):
-            raise HTTPException(status_code=403, detail="Invalid Credentials")
+        password_matches = await verify_async(user_credentials.password, password_hash)
+    except HTTPException:
+        raise
     except:
+        password_matches = False
+
+    if not password_matches:
+        record_login_failure(user_credentials.username, client_host)
         raise HTTPException(status_code=403, detail="Invalid Credentials")
     
+    reset_login_failures(user_credentials.username, client_host)
     access_token = create_access_token({
-        "user_id": user_model.id
+        "user_id": user_id
     })
     
     return {
@@ -4,7 +4,9 @@ from app.database.database import get_db
 from app.auth.oauth2 import get_current_user
 from app.database.models import Customers, Users, Orders
 from app.schemas.customers_schemas import BaseCustomer, CustomerCreate, CustomerUpdate
-from app.routers.utils import filter_by_store, calculate_next_and_last_pages, order_by_parameter
+from app.routers.utils import filter_by_store, paginate, visible_store_ids, invalidate_counts, json_list_response
+from app.routers.response_cache import conditional_get, entity_version_headers
+from pydantic import TypeAdapter
 from typing import Literal
 
 router = APIRouter(
@@ -21,8 +23,10 @@ SORTABLE_FIELDS_CUSTOMERS = {
     "updated_at": Customers.updated_at,
 }
 
+CUSTOMER_LIST_ADAPTER = TypeAdapter(list[BaseCustomer])
+
 @router.get("", response_model=list[BaseCustomer], status_code=200, summary="Get all customers")
-async def get_customers(
+def get_customers(
     request: Request,
     response: Response, 
     db: Session = Depends(get_db),
@@ -30,24 +34,22 @@ async def get_customers(
     page: int = Query(1, ge=1, description="Page number"),
     page_size: int = Query(20, ge=1, le=100, description="Number of items per page"),
     order_by: str = Query("created_at", description=f"Field to sort by. Allowed fields: {', '.join(SORTABLE_FIELDS_CUSTOMERS.keys())}"), 
-    order_dir: Literal['asc', 'desc'] = Query("desc", description="Sort direction (asc/desc)") 
+    order_dir: Literal['asc', 'desc'] = Query("desc", description="Sort direction (asc/desc)"),
+    cursor: str|None = Query(None, description="Keyset pagination cursor. Send it empty to start, then follow X-Next-Page. Skips the total count; page is ignored"),
+    exact_count: bool = Query(True, description="Set to false to estimate X-Last-Page from the per-store counters instead of counting rows"),
 ):
-    offset = (page - 1) * page_size
     customers_query = db.query(Customers)
     
     if not user.cross_store_allowed:
         customers_query = filter_by_store(customers_query, Customers, user)
 
-    customers_query = order_by_parameter(order_by, order_dir, SORTABLE_FIELDS_CUSTOMERS, customers_query)
-
-    calculate_next_and_last_pages(customers_query, page_size, page, request, response)
-
-    customers = customers_query.offset(offset).limit(page_size).all()
-    return customers
+    customers = paginate(customers_query, SORTABLE_FIELDS_CUSTOMERS, order_by, order_dir, page, page_size, cursor, request, response,
+                         exact_count=exact_count, store_ids=visible_store_ids(user))
+    return json_list_response(CUSTOMER_LIST_ADAPTER, customers, response)
 
 
 @router.get("/store/{store_id}", response_model=list[BaseCustomer], status_code=200, summary="Get all customers for a certain store")
-async def get_store_customers(
+def get_store_customers(
     request: Request,
     response: Response, 
     store_id: str,
@@ -56,22 +58,23 @@ async def get_store_customers(
     page: int = Query(1, ge=1, description="Page number"),
     page_size: int = Query(20, ge=1, le=100, description="Number of items per page"),
     order_by: str = Query("created_at", description=f"Field to sort by. Allowed fields: {', '.join(SORTABLE_FIELDS_CUSTOMERS.keys())}"), 
-    order_dir: Literal['asc', 'desc'] = Query("desc", description="Sort direction (asc/desc)") 
+    order_dir: Literal['asc', 'desc'] = Query("desc", description="Sort direction (asc/desc)"),
+    cursor: str|None = Query(None, description="Keyset pagination cursor. Send it empty to start, then follow X-Next-Page. Skips the total count; page is ignored"),
+    exact_count: bool = Query(True, description="Set to false to estimate X-Last-Page from the per-store counters instead of counting rows"),
 ):
-    offset = (page - 1) * page_size
     customers_query = db.query(Customers).filter(Customers.store_id == store_id)
     
     if not user.cross_store_allowed:
         customers_query = filter_by_store(customers_query, Customers, user)
-    
-    customers_query = order_by_parameter(order_by, order_dir, SORTABLE_FIELDS_CUSTOMERS, customers_query)
-    calculate_next_and_last_pages(customers_query, page_size, page, request, response)
-    
-    customers = customers_query.offset(offset).limit(page_size).all()
-    return customers
+
+    customers = paginate(customers_query, SORTABLE_FIELDS_CUSTOMERS, order_by, order_dir, page, page_size, cursor, request, response,
+                         exact_count=exact_count, store_ids=visible_store_ids(user, store_id))
+    return json_list_response(CUSTOMER_LIST_ADAPTER, customers, response)
 
 @router.get("/{customer_id}", response_model=BaseCustomer, status_code=200, summary="Get a customer")
-async def get_customer(customer_id: str, 
+def get_customer(customer_id: str, 
+                       request: Request,
+                       response: Response,
                        db:Session = Depends(get_db),
                        user: Users = Depends(get_current_user)
                        ):
@@ -80,14 +83,19 @@ async def get_customer(customer_id: str,
     if not user.cross_store_allowed:
         customer_query = filter_by_store(customer_query, Customers, user)
     
+    not_modified = conditional_get(request, customer_query, Customers)
+    if not_modified is not None:
+        return not_modified
+
     customer = customer_query.first()
     
     if customer is None:
         raise HTTPException(status_code=404, detail="Customer not found")
+    response.headers.update(entity_version_headers(customer.id, customer.updated_at))
     return customer
 
 @router.post("", response_model=BaseCustomer, status_code=201, summary="Create a customer")
-async def create_customer(customer: CustomerCreate, 
+def create_customer(customer: CustomerCreate, 
                           db:Session = Depends(get_db),
                           user: Users = Depends(get_current_user)
                           ):
@@ -98,11 +106,12 @@ async def create_customer(customer: CustomerCreate,
     new_customer = Customers(**customer.model_dump())
     db.add(new_customer)
     db.commit()
+    invalidate_counts(Customers)
     db.refresh(new_customer)
     return new_customer
 
 @router.put("/{customer_id}", response_model=BaseCustomer, status_code=200, summary="Update a customer")
-async def update_customer(customer_id: str, 
+def update_customer(customer_id: str, 
                           customer: CustomerUpdate, 
                           db:Session = Depends(get_db),
                           user: Users = Depends(get_current_user)
@@ -126,7 +135,7 @@ async def update_customer(customer_id: str,
     return customer_model
 
 @router.delete("/{customer_id}", status_code=204, summary="Delete a customer")
-async def delete_customer(customer_id: str, 
+def delete_customer(customer_id: str, 
                           db:Session = Depends(get_db),
                           user: Users = Depends(get_current_user)
                           ):
@@ -148,4 +157,5 @@ async def delete_customer(customer_id: str,
             detail=f"Cannot delete customer {customer_id}. They have associated orders. Please delete or reassign orders first."
         )
     db.delete(customer)
-    db.commit()
\ No newline at end of file
+    db.commit()
+    invalidate_counts(Customers)
\ No newline at end of file
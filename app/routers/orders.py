@@ -1,12 +1,14 @@
 from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, joinedload, selectinload
 from app.database.database import get_db
 from app.auth.oauth2 import get_current_user
-from app.routers.utils import filter_by_store, calculate_next_and_last_pages, order_by_parameter
-from app.database.models import Orders, Users, Leads
-from app.schemas.orders_schemas import BaseOrder, OrderCreate
+from app.routers.utils import filter_by_store, paginate, visible_store_ids, invalidate_counts, json_list_response
+from app.routers.response_cache import invalidate_product_responses, entity_validators, not_modified, not_modified_response
+from app.database.models import Orders, Users, Leads, Customers
+from app.schemas.orders_schemas import BaseOrder, OrderCreate, OrderBatchCreate, OrderBatchItemResult
+from pydantic import TypeAdapter
 from typing import List, Literal
-from app.routers.orders_utils import order_validate_customer, order_validate_products, order_products_validate_stock, order_calculate_total
+from app.routers.orders_utils import order_validate_customer, order_validate_products, order_products_validate_stock, order_calculate_total, load_orders_customers, load_orders_products
 
 router = APIRouter(
     prefix='/orders',
@@ -20,6 +22,12 @@ SORTABLE_FIELDS_ORDERS = {
     "updated_at": Orders.updated_at,
 }
 
+# Loads everything BaseOrder nests, so serializing a page doesn't lazy-load per order
+ORDER_RESPONSE_OPTIONS = (joinedload(Orders.customer), selectinload(Orders.order_products))
+# The same rows, for the HTTP validators (see entity_versions)
+ORDER_VERSION_RELATIONSHIPS = (Orders.customer, Orders.order_products)
+ORDER_LIST_ADAPTER = TypeAdapter(List[BaseOrder])
+
 @router.get('', response_model=List[BaseOrder])
 def get_orders(
     request: Request,
@@ -29,19 +37,18 @@ def get_orders(
     page: int = Query(1, ge=1, description="Page number"),
     page_size: int = Query(20, ge=1, le=100, description="Number of items per page"),
     order_by: str = Query("created_at", description=f"Field to sort by. Allowed fields: {', '.join(SORTABLE_FIELDS_ORDERS.keys())}"), 
-    order_dir: Literal['asc', 'desc'] = Query("desc", description="Sort direction (asc/desc)") 
+    order_dir: Literal['asc', 'desc'] = Query("desc", description="Sort direction (asc/desc)"),
+    cursor: str|None = Query(None, description="Keyset pagination cursor. Send it empty to start, then follow X-Next-Page. Skips the total count; page is ignored"),
+    exact_count: bool = Query(True, description="Set to false to estimate X-Last-Page from the per-store counters instead of counting rows"),
 ):
-    offset = (page - 1) * page_size
-    orders_query = db.query(Orders)
+    orders_query = db.query(Orders).options(*ORDER_RESPONSE_OPTIONS)
     if not user.cross_store_allowed:
         orders_query = filter_by_store(orders_query, Orders, user)
-    
-    calculate_next_and_last_pages(orders_query, page_size, page, request, response)
-    orders_query = order_by_parameter(order_by, order_dir, SORTABLE_FIELDS_ORDERS, orders_query)
 
-    orders = orders_query.offset(offset).limit(page_size).all()
+    orders = paginate(orders_query, SORTABLE_FIELDS_ORDERS, order_by, order_dir, page, page_size, cursor, request, response,
+                      exact_count=exact_count, store_ids=visible_store_ids(user))
 
-    return orders
+    return json_list_response(ORDER_LIST_ADAPTER, orders, response)
 
 
 @router.get('/store/{store_id}', response_model=List[BaseOrder])
@@ -54,23 +61,24 @@ def get_store_orders(
     page: int = Query(1, ge=1, description="Page number"),
     page_size: int = Query(20, ge=1, le=100, description="Number of items per page"),
     order_by: str = Query("created_at", description=f"Field to sort by. Allowed fields: {', '.join(SORTABLE_FIELDS_ORDERS.keys())}"), 
-    order_dir: Literal['asc', 'desc'] = Query("desc", description="Sort direction (asc/desc)") 
+    order_dir: Literal['asc', 'desc'] = Query("desc", description="Sort direction (asc/desc)"),
+    cursor: str|None = Query(None, description="Keyset pagination cursor. Send it empty to start, then follow X-Next-Page. Skips the total count; page is ignored"),
+    exact_count: bool = Query(True, description="Set to false to estimate X-Last-Page from the per-store counters instead of counting rows"),
 ):
-    offset = (page - 1) * page_size
-    orders_query = db.query(Orders).filter(Orders.store_id == store_id)
+    orders_query = db.query(Orders).options(*ORDER_RESPONSE_OPTIONS).filter(Orders.store_id == store_id)
     if not user.cross_store_allowed:
         orders_query = filter_by_store(orders_query, Orders, user)
 
-    calculate_next_and_last_pages(orders_query, page_size, page, request, response)
-    orders_query = order_by_parameter(order_by, order_dir, SORTABLE_FIELDS_ORDERS, orders_query)
-
-    orders = orders_query.offset(offset).limit(page_size).all()
+    orders = paginate(orders_query, SORTABLE_FIELDS_ORDERS, order_by, order_dir, page, page_size, cursor, request, response,
+                      exact_count=exact_count, store_ids=visible_store_ids(user, store_id))
     
-    return orders
+    return json_list_response(ORDER_LIST_ADAPTER, orders, response)
 
 
 @router.get('/{order_id}', response_model=BaseOrder)
 def get_order(order_id: str, 
+              request: Request,
+              response: Response,
               db: Session = Depends(get_db),
               user: Users = Depends(get_current_user)
               ):
@@ -78,10 +86,17 @@ def get_order(order_id: str,
     if not user.cross_store_allowed:
         order_query = filter_by_store(order_query, Orders, user)
     
-    order = order_query.first()
+    validators = entity_validators(order_query, Orders, *ORDER_VERSION_RELATIONSHIPS)
+    if validators is None:
+        raise HTTPException(status_code=404, detail='Order not found')
+    if not_modified(request, validators):
+        return not_modified_response(validators)
+
+    order = order_query.options(*ORDER_RESPONSE_OPTIONS).first()
 
     if not order:
         raise HTTPException(status_code=404, detail='Order not found')
+    response.headers.update(validators)
     return order
 
 
@@ -95,7 +110,7 @@ def create_order(order: OrderCreate,
     
     customer = order_validate_customer(order, db)
     order_products, products = order_validate_products(order, db)
-    available_products, leads = order_products_validate_stock(order, order_products, products)
+    available_products, leads = order_products_validate_stock(order, order_products, products, customer, db)
     
     if len(available_products) == 0:
         raise HTTPException(status_code=400, detail='No products available')
@@ -104,7 +119,11 @@ def create_order(order: OrderCreate,
     
     new_order = Orders(store_id=order.store_id, customer=customer, total=calculated_total, order_products=available_products)
     db.add(new_order)
+    invalidate_product_responses(db)
     db.commit()
+    invalidate_counts(Orders)
+    if order.new_customer_data:
+        invalidate_counts(Customers)
     db.refresh(new_order)
 
     if len(leads) > 0:
@@ -114,4 +133,69 @@ def create_order(order: OrderCreate,
             db.add(new_lead)
         db.commit()
 
-    return new_order
\ No newline at end of file
+    return new_order
+
+
+@router.post('/batch', response_model=List[OrderBatchItemResult])
+def create_orders_batch(batch: OrderBatchCreate, 
+                        db: Session = Depends(get_db),
+                        user: Users = Depends(get_current_user)
+                        ):
+    """
+    Creates several orders in a single transaction. Customers and products for the
+    whole batch are loaded with one IN query each and stock is reserved in request
+    order, so later orders see what earlier ones took. Orders that fail validation
+    are reported with their status code and don't affect the rest.
+    """
+    allowed_store_ids = {store.id for store in user.stores}
+    customers = load_orders_customers(batch.orders, db)
+    products_by_id = load_orders_products(batch.orders, db)
+
+    results = list()
+    created_orders = dict()
+    for index, order in enumerate(batch.orders):
+        try:
+            if not order.store_id in allowed_store_ids and not user.cross_store_allowed:
+                raise HTTPException(status_code=403, detail=f'User is not allowed to create orders in store {order.store_id}')
+
+            customer = order_validate_customer(order, db, customers)
+            order_products, products = order_validate_products(order, db, products_by_id)
+            available_products, leads = order_products_validate_stock(order, order_products, products, customer, db)
+
+            if len(available_products) == 0:
+                raise HTTPException(status_code=400, detail='No products available')
+        except HTTPException as e:
+            results.append(OrderBatchItemResult(index=index, status_code=e.status_code, detail=e.detail))
+            continue
+
+        calculated_total = order_calculate_total(available_products)
+        new_order = Orders(store_id=order.store_id, customer=customer, total=calculated_total, order_products=available_products)
+        db.add(new_order)
+        for lead in leads:
+            db.add(Leads(**lead.model_dump(exclude={'order_id'}), order=new_order))
+
+        created_orders[index] = new_order
+        results.append(OrderBatchItemResult(index=index, status_code=201))
+
+    if len(created_orders) == 0:
+        return results
+
+    db.flush()
+    created_order_ids = {index: new_order.id for index, new_order in created_orders.items()}
+    invalidate_product_responses(db)
+    db.commit()
+    invalidate_counts(Orders)
+    invalidate_counts(Customers)
+
+    saved_orders = (
+        db.query(Orders)
+        .options(*ORDER_RESPONSE_OPTIONS)
+        .filter(Orders.id.in_(created_order_ids.values()))
+        .all()
+    )
+    saved_orders = {saved_order.id: saved_order for saved_order in saved_orders}
+    for result in results:
+        if result.index in created_order_ids:
+            result.order = BaseOrder.model_validate(saved_orders[created_order_ids[result.index]], from_attributes=True)
+
+    return results
@@ -1,30 +1,72 @@
 from fastapi import HTTPException
 from app.database.models import Customers, Products, OrderProducts, Leads
-from app.schemas.orders_schemas import OrderCreate
+from app.schemas.orders_schemas import OrderCreate, OrderProductCreate
 from app.schemas.leads_schemas import LeadCreate
+from app.routers.utils import validate_ids
 from sqlalchemy.orm import Session
-from typing import Tuple, List
+from sqlalchemy import select, update
+from typing import Tuple, List, Dict
+import uuid
 
-def order_validate_customer(order:OrderCreate, db:Session) -> Customers:
+STOCK_RESERVATION_MAX_RETRIES = 5
+
+def load_orders_customers(orders:List[OrderCreate], db:Session) -> Dict[str, Customers]:
+    _, customers = validate_ids([order.customer_id for order in orders if order.customer_id], Customers, db)
+    return customers
+
+def load_orders_products(orders:List[OrderCreate], db:Session) -> Dict[str, Products]:
+    product_ids = [order_product.product_id for order in orders for order_product in order.order_products]
+    _, products = validate_ids(product_ids, Products, db)
+    return products
+
+def order_validate_customer(order:OrderCreate, db:Session, customers:Dict[str, Customers]|None = None) -> Customers:
+    """
+    customers is an optional id -> Customers map preloaded with load_orders_customers.
+    New customers are not added to the session here; adding the order cascades to them.
+    """
     if order.customer_id:
-        customer = db.query(Customers).filter(Customers.id == order.customer_id, Customers.store_id == order.store_id).first()
+        if customers is None:
+            customer = db.query(Customers).filter(Customers.id == order.customer_id, Customers.store_id == order.store_id).first()
+        else:
+            customer = customers.get(order.customer_id)
+            if customer and customer.store_id != order.store_id:
+                customer = None
         if not customer:
             raise HTTPException(status_code=404, detail='Customer not found')
         return customer
     elif order.new_customer_data:
-        customer = Customers(**order.new_customer_data.model_dump(), store_id=order.store_id)
-        db.add(customer)
+        # The id is assigned upfront so leads can reference the customer before the flush
+        customer = Customers(id=str(uuid.uuid4()), **order.new_customer_data.model_dump(), store_id=order.store_id)
         return customer
     else:
         raise HTTPException(status_code=400, detail='Either customer_id or new_customer_data must be provided')
     
 
-def order_validate_products(order:OrderCreate, db:Session) -> Tuple[List[OrderProducts],List[Products]]:
+def merge_order_products(order_products:List[OrderProductCreate]) -> List[OrderProductCreate]:
+    """
+    Collapses repeated product ids into a single line so stock is checked against the
+    total requested quantity.
+    """
+    quantities = dict()
+    for order_product in order_products:
+        quantities[order_product.product_id] = quantities.get(order_product.product_id, 0) + order_product.quantity
+    return [OrderProductCreate(product_id=product_id, quantity=quantity) for product_id, quantity in quantities.items()]
+
+def order_validate_products(order:OrderCreate, db:Session, products_by_id:Dict[str, Products]|None = None) -> Tuple[List[OrderProducts],List[Products]]:
+    """
+    products_by_id is an optional id -> Products map preloaded with load_orders_products.
+    Without it, every product in the order is loaded with a single IN query.
+    """
+    if products_by_id is None:
+        products_by_id = load_orders_products([order], db)
+
     order_products = []
     products = []
 
-    for order_product in order.order_products:
-        product = db.query(Products).filter(Products.id == order_product.product_id, Products.store_id == order.store_id).first()
+    for order_product in merge_order_products(order.order_products):
+        product = products_by_id.get(order_product.product_id)
+        if product and product.store_id != order.store_id:
+            product = None
         if not product:
             raise HTTPException(status_code=404, detail='Product not found')
         products.append(product)
@@ -32,21 +74,60 @@ def order_validate_products(order:OrderCreate, db:Session) -> Tuple[List[OrderPr
     
     return order_products, products
 
-def order_products_validate_stock(order:OrderCreate, order_products:list[OrderProducts], products:list[Products]) -> Tuple[List[OrderProducts], List[LeadCreate]]:
+def reserve_stock(product_id:str, quantity:int, db:Session) -> int:
+    """
+    Takes up to quantity units from the product's stock and returns how many were taken.
+    Stock is only changed through conditional UPDATEs evaluated by the database, so
+    concurrent orders (other workers included) can't oversell: the full quantity is
+    taken with a single statement when available, otherwise whatever is left is taken
+    with a compare-and-set on the value just read.
+    """
+    if quantity <= 0:
+        return 0
+
+    result = db.execute(
+        update(Products)
+        .where(Products.id == product_id, Products.stock >= quantity)
+        .values(stock=Products.stock - quantity)
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount == 1:
+        return quantity
+
+    for _ in range(STOCK_RESERVATION_MAX_RETRIES):
+        available = db.execute(select(Products.stock).where(Products.id == product_id)).scalar_one_or_none()
+        if not available or available <= 0:
+            return 0
+
+        reserved = min(available, quantity)
+        result = db.execute(
+            update(Products)
+            .where(Products.id == product_id, Products.stock == available)
+            .values(stock=Products.stock - reserved)
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount == 1:
+            return reserved
+    return 0
+
+def order_products_validate_stock(order:OrderCreate, order_products:list[OrderProducts], products:list[Products], customer:Customers, db:Session) -> Tuple[List[OrderProducts], List[LeadCreate]]:
+    """
+    Reserves stock for every line. Lines that can't be fully served are reduced to the
+    reserved quantity and the shortfall is returned as leads.
+    """
     available_products, leads = list(), list()
     for order_product, product in zip(order_products, products):
-        if product.stock < order_product.quantity: 
-                #raise HTTPException(status_code=400, detail=f'Insufficient stock for product: {product.name}')
-                lead_product_quantity = order_product.quantity - product.stock
-                order_product.quantity = product.stock   
-                leads.append(LeadCreate(store_id=product.store_id, 
-                                        customer_id=order.customer_id, 
-                                        product_id=product.id, 
-                                        product_quantity=lead_product_quantity)
-                                        )
+        requested_quantity = order_product.quantity
+        order_product.quantity = reserve_stock(product.id, requested_quantity, db)
+
+        if order_product.quantity < requested_quantity:
+            leads.append(LeadCreate(store_id=product.store_id, 
+                                    customer_id=customer.id, 
+                                    product_id=product.id, 
+                                    product_quantity=requested_quantity - order_product.quantity)
+                                    )
         
         available_products.append(order_product) if order_product.quantity > 0 else None
-        product.stock -= order_product.quantity #Listo para separar logica de descuento de stock
     return available_products, leads
 
                 
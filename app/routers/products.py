@@ -4,7 +4,10 @@ from app.database.database import get_db
 from app.database.models import Products, Users
 from app.schemas.products_schemas import BaseProduct, ProductCreate, ProductUpdate
 from app.auth.oauth2 import get_current_user
-from app.routers.utils import filter_by_store, calculate_next_and_last_pages, order_by_parameter
+from app.routers.utils import filter_by_store, paginate, visible_store_ids, invalidate_counts
+from app.routers.response_cache import (products_response_cache, invalidate_product_responses, product_responses_generation, response_cache_key,
+                                        get_cached_response, cache_response, conditional_get, entity_version_headers)
+from pydantic import TypeAdapter
 from typing import Literal
 router = APIRouter(
     prefix='/products',
@@ -19,8 +22,11 @@ SORTABLE_FIELDS_PRODUCTS = {
     "updated_at": Products.updated_at,
 }
 
+PRODUCT_ADAPTER = TypeAdapter(BaseProduct)
+PRODUCT_LIST_ADAPTER = TypeAdapter(list[BaseProduct])
+
 @router.get("", response_model=list[BaseProduct], status_code=200, summary="Get all products")
-async def get_products(
+def get_products(
     request: Request,
     response: Response, 
     db: Session = Depends(get_db),
@@ -28,22 +34,27 @@ async def get_products(
     page: int = Query(1, ge=1, description="Page number"),
     page_size: int = Query(20, ge=1, le=100, description="Number of items per page"),
     order_by: str = Query("created_at", description=f"Field to sort by. Allowed fields: {', '.join(SORTABLE_FIELDS_PRODUCTS.keys())}"), 
-    order_dir: Literal['asc', 'desc'] = Query("desc", description="Sort direction (asc/desc)") 
+    order_dir: Literal['asc', 'desc'] = Query("desc", description="Sort direction (asc/desc)"),
+    cursor: str|None = Query(None, description="Keyset pagination cursor. Send it empty to start, then follow X-Next-Page. Skips the total count; page is ignored"),
+    exact_count: bool = Query(True, description="Set to false to estimate X-Last-Page from the per-store counters instead of counting rows"),
 ):
-    offset = (page - 1) * page_size
+    store_ids = visible_store_ids(user)
+    cache_key = response_cache_key(request, store_ids, product_responses_generation(db))
+    cached_response = get_cached_response(products_response_cache, cache_key, request)
+    if cached_response is not None:
+        return cached_response
+
     products_query = db.query(Products)
     
     if not user.cross_store_allowed:
         products_query = filter_by_store(products_query, Products, user)
-    
-    products_query = order_by_parameter(order_by, order_dir, SORTABLE_FIELDS_PRODUCTS, products_query)
-    
-    calculate_next_and_last_pages(products_query, page_size, page, request, response)
-    products = products_query.offset(offset).limit(page_size).all()
-    return products
+
+    products = paginate(products_query, SORTABLE_FIELDS_PRODUCTS, order_by, order_dir, page, page_size, cursor, request, response,
+                        exact_count=exact_count, store_ids=store_ids)
+    return cache_response(products_response_cache, cache_key, request, response, PRODUCT_LIST_ADAPTER, products)
 
 @router.get("/store/{store_id}", response_model=list[BaseProduct], status_code=200, summary="Get all products for a store")
-async def get_store_products(
+def get_store_products(
     request: Request,
     response: Response, 
     store_id:str,
@@ -52,38 +63,54 @@ async def get_store_products(
     page: int = Query(1, ge=1, description="Page number"),
     page_size: int = Query(20, ge=1, le=100, description="Number of items per page"),
     order_by: str = Query("created_at", description=f"Field to sort by. Allowed fields: {', '.join(SORTABLE_FIELDS_PRODUCTS.keys())}"), 
-    order_dir: Literal['asc', 'desc'] = Query("desc", description="Sort direction (asc/desc)") 
+    order_dir: Literal['asc', 'desc'] = Query("desc", description="Sort direction (asc/desc)"),
+    cursor: str|None = Query(None, description="Keyset pagination cursor. Send it empty to start, then follow X-Next-Page. Skips the total count; page is ignored"),
+    exact_count: bool = Query(True, description="Set to false to estimate X-Last-Page from the per-store counters instead of counting rows"),
 ):
-    offset = (page - 1) * page_size
+    store_ids = visible_store_ids(user, store_id)
+    cache_key = response_cache_key(request, store_ids, product_responses_generation(db))
+    cached_response = get_cached_response(products_response_cache, cache_key, request)
+    if cached_response is not None:
+        return cached_response
 
     products_query = db.query(Products).filter(Products.store_id == store_id)
     
     if not user.cross_store_allowed:
         products_query = filter_by_store(products_query, Products, user)
-    
-    products_query = order_by_parameter(order_by, order_dir, SORTABLE_FIELDS_PRODUCTS, products_query)
 
-    calculate_next_and_last_pages(products_query, page_size, page, request, response)
-    products = products_query.offset(offset).limit(page_size).all()
-    return products
+    products = paginate(products_query, SORTABLE_FIELDS_PRODUCTS, order_by, order_dir, page, page_size, cursor, request, response,
+                        exact_count=exact_count, store_ids=store_ids)
+    return cache_response(products_response_cache, cache_key, request, response, PRODUCT_LIST_ADAPTER, products)
 
 @router.get("/{product_id}", response_model=BaseProduct, status_code=200, summary="Get a product")
-async def get_product(  product_id: str, 
+def get_product(  product_id: str, 
+                        request: Request,
+                        response: Response,
                         db:Session = Depends(get_db),
                         user: Users = Depends(get_current_user)):
+    cache_key = response_cache_key(request, visible_store_ids(user), product_responses_generation(db))
+    cached_response = get_cached_response(products_response_cache, cache_key, request)
+    if cached_response is not None:
+        return cached_response
+
     product_query = db.query(Products).filter(Products.id == product_id)
     
     if not user.cross_store_allowed:
         product_query = filter_by_store(product_query, Products, user)
 
+    not_modified = conditional_get(request, product_query, Products)
+    if not_modified is not None:
+        return not_modified
+
     product = product_query.first()
 
     if product is None:
         raise HTTPException(status_code=404, detail="Product not found")
-    return product
+    return cache_response(products_response_cache, cache_key, request, response, PRODUCT_ADAPTER, product,
+                          validators=entity_version_headers(product.id, product.updated_at))
 
 @router.post("", response_model=BaseProduct, status_code=201, summary="Create a product")
-async def create_product(product: ProductCreate, 
+def create_product(product: ProductCreate, 
                          db:Session = Depends(get_db),
                          user: Users = Depends(get_current_user)
                          ):
@@ -92,12 +119,14 @@ async def create_product(product: ProductCreate,
         
     new_product = Products(**product.model_dump())
     db.add(new_product)
+    invalidate_product_responses(db)
     db.commit()
+    invalidate_counts(Products)
     db.refresh(new_product)
     return new_product
 
 @router.put("/{product_id}", response_model=BaseProduct, status_code=200, summary="Update a product")
-async def update_product(product_id: str, 
+def update_product(product_id: str, 
                          product: ProductUpdate, 
                          db:Session = Depends(get_db),
                          user: Users = Depends(get_current_user)
@@ -115,12 +144,13 @@ async def update_product(product_id: str,
         if value is not None:
             setattr(product_model, key, value)
 
+    invalidate_product_responses(db)
     db.commit()
     db.refresh(product_model)
     return product_model
 
 @router.delete("/{product_id}", status_code=204, summary="Delete a product")
-async def delete_product(product_id: str, 
+def delete_product(product_id: str, 
                          db:Session = Depends(get_db),
                          user: Users = Depends(get_current_user)
                          ):
@@ -134,7 +164,9 @@ async def delete_product(product_id: str,
         raise HTTPException(status_code=404, detail="Product not found")
     
     db.delete(product)
+    invalidate_product_responses(db)
     db.commit()
+    invalidate_counts(Products)
     return
 
 
@@ -0,0 +1,151 @@
+import hashlib
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from fastapi import Request, Response
+from pydantic import TypeAdapter
+from sqlalchemy import distinct, func
+from sqlalchemy.orm import Query, Session
+from app.cache import TTLCache
+from app.database.models.base_models import utc_now
+from app.database.models.cache_models import cache_generation, bump_cache_generation
+
+PRODUCT_RESPONSE_CACHE_TTL_SECONDS = 30
+PRODUCT_RESPONSE_CACHE_MAX_ENTRIES = 2048
+
+# Pagination headers set by paginate() that are part of a cached listing response
+CACHED_RESPONSE_HEADERS = ("X-Next-Page", "X-Last-Page")
+
+# HTTP dates have second resolution: a Last-Modified younger than this could be
+# followed by another write in the same second that If-Modified-Since can't see.
+LAST_MODIFIED_MIN_AGE = timedelta(seconds=1)
+
+PRODUCT_RESPONSE_CACHE = "products"
+
+# (generation, route template, path params, query params, visible stores) -> (body, headers)
+products_response_cache = TTLCache(maxsize=PRODUCT_RESPONSE_CACHE_MAX_ENTRIES, ttl=PRODUCT_RESPONSE_CACHE_TTL_SECONDS)
+
+def invalidate_product_responses(db:Session) -> None:
+    """
+    Called before committing any change to products, including stock taken by orders.
+    Bumps the shared generation in that transaction, so every worker stops using its
+    entries once the change is visible; entries of old generations age out by TTL.
+    """
+    bump_cache_generation(db, PRODUCT_RESPONSE_CACHE)
+
+def product_responses_generation(db:Session) -> int:
+    return cache_generation(db, PRODUCT_RESPONSE_CACHE)
+
+def response_cache_key(request:Request, store_ids:set[str]|None, generation:int) -> tuple:
+    """
+    Same generation, route, parameters and visible stores always produce the same
+    response, so users with the same store access share entries.
+    """
+    route = request.scope.get("route")
+    return (
+        generation,
+        getattr(route, "path", request.url.path),
+        tuple(sorted(request.path_params.items())),
+        tuple(sorted(request.query_params.multi_items())),
+        None if store_ids is None else frozenset(store_ids),
+    )
+
+def etag_matches(request:Request, etag:str) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return "*" in candidates or etag.removeprefix("W/") in candidates
+
+def not_modified(request:Request, headers:dict[str, str]) -> bool:
+    """
+    If-None-Match wins over If-Modified-Since, as in RFC 9110.
+    """
+    if request.headers.get("if-none-match"):
+        return etag_matches(request, headers["ETag"])
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if not if_modified_since or "Last-Modified" not in headers:
+        return False
+    try:
+        return parsedate_to_datetime(headers["Last-Modified"]) <= parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+
+def not_modified_response(headers:dict[str, str]) -> Response:
+    return Response(status_code=304, headers={name: headers[name] for name in ("ETag", "Last-Modified") if name in headers})
+
+def entity_versions(query:Query, model, *relationships) -> tuple|None:
+    """
+    (id, updated_at) of the row in query followed by (newest updated_at, row count) for
+    each relationship embedded in its representation, in one grouped query. Chains are
+    given hop by hop and outer joined in order, e.g. Roles.permissions, RolePermissions.permission.
+    The counts catch removed rows, which leave no timestamp behind.
+    """
+    columns = [model.id, model.updated_at]
+    for relationship in relationships:
+        query = query.outerjoin(relationship)
+        target = relationship.property.mapper.class_
+        columns += [func.max(target.updated_at), func.count(distinct(target.id))]
+    return query.with_entities(*columns).group_by(model.id, model.updated_at).first()
+
+def entity_version_headers(entity_id:str, updated_at:datetime|None, *embedded) -> dict[str, str]:
+    """
+    Weak validators for a row plus the (newest updated_at, count) pairs of the rows
+    embedded in it (see entity_versions). Last-Modified is the newest timestamp and is
+    left out while it is younger than LAST_MODIFIED_MIN_AGE; the ETag covers the rest.
+    """
+    version = "|".join("" if value is None else str(value) for value in (entity_id, updated_at, *embedded))
+    headers = {"ETag": f'W/"{hashlib.sha256(version.encode()).hexdigest()[:32]}"'}
+    newest = max((timestamp for timestamp in (updated_at, *embedded[0::2]) if timestamp is not None), default=None)
+    if newest is not None and utc_now() - newest >= LAST_MODIFIED_MIN_AGE:
+        headers["Last-Modified"] = format_datetime(newest.replace(tzinfo=timezone.utc), usegmt=True)
+    return headers
+
+def entity_validators(query:Query, model, *relationships) -> dict[str, str]|None:
+    """
+    Validators for the row in query and the relationships embedded in its response,
+    or None when there is no such row.
+    """
+    versions = entity_versions(query, model, *relationships)
+    return None if versions is None else entity_version_headers(*versions)
+
+def conditional_get(request:Request, query:Query, model) -> Response|None:
+    """
+    For requests carrying If-None-Match/If-Modified-Since, fetches only (id, updated_at)
+    from query and returns a 304 when the client's copy is current. Returns None when
+    the full entity has to be loaded: unconditional request, changed entity or no match.
+    Only for rows whose representation embeds no other rows; use entity_validators
+    for the rest.
+    """
+    if not request.headers.get("if-none-match") and not request.headers.get("if-modified-since"):
+        return None
+
+    headers = entity_validators(query, model)
+    if headers is None:
+        return None
+    return not_modified_response(headers) if not_modified(request, headers) else None
+
+def build_cached_response(request:Request, body:bytes, headers:dict[str, str]) -> Response:
+    if not_modified(request, headers):
+        return not_modified_response(headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+def get_cached_response(cache:TTLCache, key:tuple, request:Request) -> Response|None:
+    entry = cache.get(key)
+    if entry is None:
+        return None
+    body, headers = entry
+    return build_cached_response(request, body, headers)
+
+def cache_response(cache:TTLCache, key:tuple, request:Request, response:Response, adapter:TypeAdapter, content,
+                   validators:dict[str, str]|None = None) -> Response:
+    """
+    Serializes content (ORM objects) with adapter, stores the body with the pagination
+    headers already set on response, and returns the response to send. The ETag is a
+    hash of the body unless validators (see entity_version_headers) are given.
+    """
+    body = adapter.dump_json(adapter.validate_python(content, from_attributes=True))
+    headers = {name: response.headers[name] for name in CACHED_RESPONSE_HEADERS if name in response.headers}
+    headers.update(validators or {"ETag": f'"{hashlib.sha256(body).hexdigest()[:32]}"'})
+    cache.set(key, (body, headers))
+    return build_cached_response(request, body, headers)
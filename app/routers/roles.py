@@ -1,11 +1,15 @@
 from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
 from sqlalchemy.orm import Session, joinedload
 from app.database.database import get_db
+from app.database.models.base_models import utc_now
 from app.database.models import Roles, Permissions, RolePermissions, Users
 from app.schemas.users_schemas import BaseRole, RoleCreate, RoleUpdate
+from pydantic import TypeAdapter
 from typing import List, Literal
-from app.routers.utils import validate_ids, convert_role_to_baserole, filter_by_store, calculate_next_and_last_pages, order_by_parameter
+from app.routers.utils import validate_ids, convert_role_to_baserole, ROLE_PERMISSIONS_OPTION, filter_by_store, paginate, visible_store_ids, invalidate_counts, json_list_response, touch_users, users_with_role
 from app.auth.oauth2 import get_current_user
+from app.auth.auth_utils import invalidate_user_permissions
+from app.routers.response_cache import entity_validators, not_modified, not_modified_response
 
 
 router = APIRouter(
@@ -20,8 +24,12 @@ SORTABLE_FIELDS_ROLES = {
     "updated_at": Roles.updated_at,
 }
 
+ROLE_LIST_ADAPTER = TypeAdapter(List[BaseRole])
+# Rows embedded in a BaseRole, for the HTTP validators (see entity_versions)
+ROLE_VERSION_RELATIONSHIPS = (Roles.permissions, RolePermissions.permission)
+
 @router.get("", response_model=List[BaseRole])
-async def get_roles(
+def get_roles(
     request: Request,
     response: Response, 
     db: Session = Depends(get_db),
@@ -29,40 +37,48 @@ async def get_roles(
     page: int = Query(1, ge=1),
     page_size: int = Query(20, ge=1, le=100),
     order_by: str = Query("created_at", description=f"Field to sort by. Allowed fields: {', '.join(SORTABLE_FIELDS_ROLES.keys())}"), 
-    order_dir: Literal['asc', 'desc'] = Query("desc", description="Sort direction (asc/desc)") 
+    order_dir: Literal['asc', 'desc'] = Query("desc", description="Sort direction (asc/desc)"),
+    cursor: str|None = Query(None, description="Keyset pagination cursor. Send it empty to start, then follow X-Next-Page. Skips the total count; page is ignored"),
+    exact_count: bool = Query(True, description="Set to false to estimate X-Last-Page from the per-store counters instead of counting rows"),
 ):
-    offset = (page - 1) * page_size
     roles_query = db.query(Roles).options(joinedload(Roles.permissions).joinedload(RolePermissions.permission))
 
     if not user.cross_store_allowed:
         roles_query = filter_by_store(roles_query, Roles, user)
 
-    calculate_next_and_last_pages(roles_query, page_size, page, request, response)
-    roles_query = order_by_parameter(order_by, order_dir, SORTABLE_FIELDS_ROLES, roles_query)
-
-    roles = roles_query.offset(offset).limit(page_size).all()
-    roles_with_permissions = [convert_role_to_baserole(role, db) for role in roles]
+    roles = paginate(roles_query, SORTABLE_FIELDS_ROLES, order_by, order_dir, page, page_size, cursor, request, response,
+                     exact_count=exact_count, store_ids=visible_store_ids(user))
+    roles_with_permissions = [convert_role_to_baserole(role) for role in roles]
 
-    return roles_with_permissions
+    return json_list_response(ROLE_LIST_ADAPTER, roles_with_permissions, response)
 
 @router.get("/{role_id}", response_model=BaseRole)
-async def get_role(role_id: str, 
+def get_role(role_id: str, 
+                   request: Request,
+                   response: Response,
                    db: Session = Depends(get_db),
                    user: Users = Depends(get_current_user)
                    ):
-    role_query = db.query(Roles).options(joinedload(Roles.permissions).joinedload(RolePermissions.permission)).filter(Roles.id == role_id)
+    role_query = db.query(Roles).filter(Roles.id == role_id)
 
     if not user.cross_store_allowed:
         role_query = filter_by_store(role_query, Roles, user)
 
-    role = role_query.first()
+    validators = entity_validators(role_query, Roles, *ROLE_VERSION_RELATIONSHIPS)
+    if validators is None:
+        raise HTTPException(status_code=404, detail="Role not found")
+    if not_modified(request, validators):
+        return not_modified_response(validators)
+
+    role = role_query.options(joinedload(Roles.permissions).joinedload(RolePermissions.permission)).first()
 
     if not role:
         raise HTTPException(status_code=404, detail="Role not found")
-    return convert_role_to_baserole(role, db)
+    response.headers.update(validators)
+    return convert_role_to_baserole(role)
 
 @router.get("/store/{store_id}", response_model = List[BaseRole])
-async def get_roles_by_store(
+def get_roles_by_store(
     request: Request,
     response: Response, 
     store_id: str, 
@@ -71,29 +87,28 @@ async def get_roles_by_store(
     page: int = Query(1, ge=1),
     page_size: int = Query(20, ge=1, le=100),
     order_by: str = Query("created_at", description=f"Field to sort by. Allowed fields: {', '.join(SORTABLE_FIELDS_ROLES.keys())}"), 
-    order_dir: Literal['asc', 'desc'] = Query("desc", description="Sort direction (asc/desc)") 
+    order_dir: Literal['asc', 'desc'] = Query("desc", description="Sort direction (asc/desc)"),
+    cursor: str|None = Query(None, description="Keyset pagination cursor. Send it empty to start, then follow X-Next-Page. Skips the total count; page is ignored"),
+    exact_count: bool = Query(True, description="Set to false to estimate X-Last-Page from the per-store counters instead of counting rows"),
 ):
-    offset = (page - 1) * page_size
     roles_query = db.query(Roles).options(joinedload(Roles.permissions).joinedload(RolePermissions.permission)).filter(Roles.store_id == store_id)
 
     if not user.cross_store_allowed:
         roles_query = filter_by_store(roles_query, Roles, user)
-    
-    calculate_next_and_last_pages(roles_query, page_size, page, request, response)
-    roles_query = order_by_parameter(order_by, order_dir, SORTABLE_FIELDS_ROLES, roles_query)
 
-    roles = roles_query.offset(offset).limit(page_size).all()
+    roles = paginate(roles_query, SORTABLE_FIELDS_ROLES, order_by, order_dir, page, page_size, cursor, request, response,
+                     exact_count=exact_count, store_ids=visible_store_ids(user, store_id))
 
-    roles_with_permissions = [convert_role_to_baserole(role, db) for role in roles]
+    roles_with_permissions = [convert_role_to_baserole(role) for role in roles]
     
-    return roles_with_permissions
+    return json_list_response(ROLE_LIST_ADAPTER, roles_with_permissions, response)
 
 @router.post("", response_model=BaseRole)
-async def create_role(role: RoleCreate, 
+def create_role(role: RoleCreate, 
                       db: Session = Depends(get_db),
                       user: Users = Depends(get_current_user)
                       ):
-    invalid_permissions = validate_ids(role.role_permissions,Permissions, db)
+    invalid_permissions, _ = validate_ids(role.role_permissions,Permissions, db)
     if len(invalid_permissions) > 0:
         raise HTTPException(status_code=404, detail=f"Permission with the following ids were not found: {invalid_permissions}")
 
@@ -110,11 +125,13 @@ async def create_role(role: RoleCreate,
 
     db.add(new_role)
     db.commit()
-    db.refresh(new_role)
-    return convert_role_to_baserole(new_role, db)
+    invalidate_user_permissions()
+    invalidate_counts(Roles)
+    new_role = db.query(Roles).options(ROLE_PERMISSIONS_OPTION).filter(Roles.id == new_role.id).one()
+    return convert_role_to_baserole(new_role)
 
 @router.put("/{role_id}", response_model=BaseRole)
-async def update_role(role_id: str, 
+def update_role(role_id: str, 
                       role: RoleUpdate, 
                       db: Session = Depends(get_db),
                       user: Users = Depends(get_current_user)
@@ -130,7 +147,7 @@ async def update_role(role_id: str,
         raise HTTPException(status_code=404, detail="Role not found")
     
     if 'role_permissions' in role.model_dump(exclude_unset=True) and role.role_permissions is not None:
-      invalid_permissions = validate_ids(role.role_permissions, Permissions, db)
+      invalid_permissions, _ = validate_ids(role.role_permissions, Permissions, db)
       if len(invalid_permissions) > 0:
         raise HTTPException(status_code=404, detail=f"Permission with the following ids were not found: {invalid_permissions}")
       
@@ -144,20 +161,23 @@ async def update_role(role_id: str,
         db.add(new_permission)
         permissions.append(new_permission)
       role_model.permissions = permissions
+      # The role row itself may not change, but its representation does
+      role_model.updated_at = utc_now()
 
 
     for key,value in role.model_dump(exclude_unset=True).items():
       if value is not None and key != 'role_permissions':
         setattr(role_model, key, value)
       
-
+    touch_users(db, users_with_role(role_id))
     db.commit()
-    db.refresh(role_model)
-    return convert_role_to_baserole(role_model, db)
+    invalidate_user_permissions()
+    role_model = db.query(Roles).options(ROLE_PERMISSIONS_OPTION).filter(Roles.id == role_id).one()
+    return convert_role_to_baserole(role_model)
 
 
 @router.delete("/{role_id}", status_code=204)
-async def delete_role(role_id:str, 
+def delete_role(role_id:str, 
                       db:Session = Depends(get_db),
                       user: Users = Depends(get_current_user)
                       ):
@@ -171,6 +191,9 @@ async def delete_role(role_id:str,
     if role is None:
         raise HTTPException(status_code=404, detail="Role not found")
     
+    touch_users(db, users_with_role(role_id))
     db.delete(role)
     db.commit()
+    invalidate_user_permissions()
+    invalidate_counts(Roles)
     return
\ No newline at end of file
@@ -1,10 +1,13 @@
 from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
 from sqlalchemy.orm import Session
 from app.database.database import get_db
-from app.database.models import Stores, Users, UserStores, Roles, UserRoles, RolePermissions
-from app.schemas.stores_schemas import BaseStore, StoreCreate, StoreUpdate
-from app.routers.utils import filter_by_store, calculate_next_and_last_pages, order_by_parameter
+from app.database.models import Stores, Users, UserStores, Roles, UserRoles, RolePermissions, StoreStats
+from app.database.models.stats_models import store_stats_summary
+from app.schemas.stores_schemas import BaseStore, StoreCreate, StoreUpdate, StoreStatsResponse
+from app.routers.utils import filter_by_store, paginate, invalidate_counts, visible_store_ids, json_list_response, touch_users, users_in_store
 from app.auth.oauth2 import get_current_user
+from app.auth.auth_utils import invalidate_user_permissions
+from pydantic import TypeAdapter
 from typing import List, Literal
 
 router = APIRouter(
@@ -19,8 +22,10 @@ SORTABLE_FIELDS_STORES = {
     "updated_at": Stores.updated_at,
 }
 
+STORE_LIST_ADAPTER = TypeAdapter(List[BaseStore])
+
 @router.get("", response_model=List[BaseStore])
-async def get_stores(
+def get_stores(
     request: Request,
     response: Response, 
     db: Session = Depends(get_db),
@@ -28,23 +33,29 @@ async def get_stores(
     page: int = Query(1, ge=1),
     page_size: int = Query(20, ge=1, le=100),
     order_by: str = Query("created_at", description=f"Field to sort by. Allowed fields: {', '.join(SORTABLE_FIELDS_STORES.keys())}"), 
-    order_dir: Literal['asc', 'desc'] = Query("desc", description="Sort direction (asc/desc)") 
+    order_dir: Literal['asc', 'desc'] = Query("desc", description="Sort direction (asc/desc)"),
+    cursor: str|None = Query(None, description="Keyset pagination cursor. Send it empty to start, then follow X-Next-Page. Skips the total count; page is ignored"),
 ):
-    offset = (page - 1) * page_size
     stores_query = db.query(Stores)
     
     if not user.cross_store_allowed:
         stores_query = filter_by_store(stores_query, Stores, user)
-    
-    calculate_next_and_last_pages(stores_query, page_size, page, request, response)
-    stores_query = order_by_parameter(order_by, order_dir, SORTABLE_FIELDS_STORES, stores_query)
 
-    stores = stores_query.offset(offset).limit(page_size).all()
+    stores = paginate(stores_query, SORTABLE_FIELDS_STORES, order_by, order_dir, page, page_size, cursor, request, response)
 
-    return stores
+    return json_list_response(STORE_LIST_ADAPTER, stores, response)
+
+@router.get("/stats", response_model=List[StoreStatsResponse])
+def get_stores_stats(db: Session = Depends(get_db),
+                     user: Users = Depends(get_current_user)
+                     ):
+    """
+    Products, customers, orders and roles per store, read from the maintained store_stats counters.
+    """
+    return store_stats_summary(db, visible_store_ids(user))
 
 @router.post("", response_model=BaseStore)
-async def create_store(store: StoreCreate, 
+def create_store(store: StoreCreate, 
                        db: Session = Depends(get_db),
                        user: Users = Depends(get_current_user)
                        ):
@@ -56,10 +67,12 @@ async def create_store(store: StoreCreate,
     user_store = UserStores(user_id=user.id, store_id=new_store.id)
     db.add(user_store)
     db.commit()
+    invalidate_counts(Stores)
+    invalidate_counts(Users)
     return new_store
 
 @router.put("/{store_id}", response_model=BaseStore)
-async def update_store(store_id: str, 
+def update_store(store_id: str, 
                        store: StoreUpdate, 
                        db: Session = Depends(get_db),
                        user: Users = Depends(get_current_user)
@@ -74,12 +87,13 @@ async def update_store(store_id: str,
         raise HTTPException(status_code=404, detail="Store not found")
     for key, value in store.model_dump(exclude_unset=True).items():
         setattr(existing_store, key, value)
+    touch_users(db, users_in_store(store_id))
     db.commit()
     db.refresh(existing_store)
     return existing_store
 
 @router.delete("/{store_id}")
-async def delete_store(store_id: str, 
+def delete_store(store_id: str, 
                        db: Session = Depends(get_db),
                        user: Users = Depends(get_current_user)
                        ):
@@ -93,6 +107,7 @@ async def delete_store(store_id: str,
     if not existing_store:
         raise HTTPException(status_code=404, detail="Store not found")
     
+    touch_users(db, users_in_store(store_id))
     db.query(UserStores).filter(UserStores.store_id == store_id).delete(synchronize_session=False)
     
     roles_in_store_subquery = db.query(Roles.id).filter(Roles.store_id == store_id).scalar_subquery()
@@ -103,6 +118,12 @@ async def delete_store(store_id: str,
         
     db.query(Roles).filter(Roles.store_id == store_id).delete(synchronize_session=False)
 
+    db.query(StoreStats).filter(StoreStats.store_id == store_id).delete(synchronize_session=False)
+
 
     db.delete(existing_store)
     db.commit()
+    invalidate_user_permissions()
+    invalidate_counts(Stores)
+    invalidate_counts(Roles)
+    invalidate_counts(Users)
@@ -1,11 +1,16 @@
 from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
-from sqlalchemy.orm import Session, joinedload
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.orm import Session, selectinload
 from app.database.database import get_db
-from app.database.models import Users, UserStores, Stores, Roles, UserRoles
+from app.database.models.base_models import utc_now
+from app.database.models import Users, UserStores, Stores, Roles, UserRoles, RolePermissions
 from app.schemas.users_schemas import UserCreate, UserUpdate, UserResponse, UserRolePatch, UserStorePatch
+from pydantic import TypeAdapter
 from typing import List, Literal
-from app.routers.utils import validate_ids, convert_usercreate_to_userresponse, convert_role_to_baserole, convert_store_to_basestore, calculate_next_and_last_pages, order_by_parameter
-from app.auth.hashing import hash_string
+from app.routers.utils import validate_ids, convert_usercreate_to_userresponse, convert_user_to_userresponse, convert_users_to_userresponses, paginate, invalidate_counts, json_list_response
+from app.auth.hashing import hash_string_async
+from app.auth.auth_utils import invalidate_user_permissions
+from app.routers.response_cache import conditional_get, entity_version_headers
 
 router = APIRouter(
     prefix='/users',
@@ -20,74 +25,52 @@ SORTABLE_FIELDS_USERS = {
     "updated_at": Users.updated_at,
 }
 
+# selectinload keeps the query count constant per page regardless of how many roles, permissions or stores are involved
+USER_RESPONSE_OPTIONS = (
+    selectinload(Users.roles).selectinload(UserRoles.role).selectinload(Roles.permissions).selectinload(RolePermissions.permission),
+    selectinload(Users.user_stores).selectinload(UserStores.store),
+)
+USER_LIST_ADAPTER = TypeAdapter(List[UserResponse])
+
 @router.get("", response_model=List[UserResponse])
-async def get_users(
+def get_users(
     request: Request,
     response: Response, 
     db: Session = Depends(get_db),
     page: int = Query(1, ge=1),
     page_size: int = Query(20, ge=1, le=100),
     order_by: str = Query("created_at", description=f"Field to sort by. Allowed fields: {', '.join(SORTABLE_FIELDS_USERS.keys())}"), 
-    order_dir: Literal['asc', 'desc'] = Query("desc", description="Sort direction (asc/desc)") 
+    order_dir: Literal['asc', 'desc'] = Query("desc", description="Sort direction (asc/desc)"),
+    cursor: str|None = Query(None, description="Keyset pagination cursor. Send it empty to start, then follow X-Next-Page. Skips the total count; page is ignored"),
 ):
-    offset = (page - 1) * page_size
     users_query = (
         db.query(Users)
-        .options(
-            joinedload(Users.roles).joinedload(UserRoles.role),
-            joinedload(Users.user_stores).joinedload(UserStores.store)
-        )
+        .options(*USER_RESPONSE_OPTIONS)
     )
-    calculate_next_and_last_pages(users_query, page_size, page, request, response)
-    users_query = order_by_parameter(order_by, order_dir, SORTABLE_FIELDS_USERS, users_query)
-
-    users = users_query.offset(offset).limit(page_size).all()
 
-    user_responses = []
-    for user in users:
-      roles_list = [convert_role_to_baserole(user_role.role, db) for user_role in user.roles]
-      stores_list = [convert_store_to_basestore(user_store.store) for user_store in user.user_stores]
-      user_response = UserResponse(
-            id=user.id,
-            name=user.name,
-            email=user.email,
-            cross_store_allowed=user.cross_store_allowed,
-            user_stores=stores_list,
-            user_roles=roles_list
-        )
-      user_responses.append(user_response)
+    users = paginate(users_query, SORTABLE_FIELDS_USERS, order_by, order_dir, page, page_size, cursor, request, response)
 
-    return user_responses
+    return json_list_response(USER_LIST_ADAPTER, convert_users_to_userresponses(users), response)
 
 @router.get("/{user_id}", response_model=UserResponse)
-async def get_user(user_id: str, db: Session = Depends(get_db)):
-    user = (
-        db.query(Users)
-        .options(
-            joinedload(Users.roles).joinedload(UserRoles.role),
-            joinedload(Users.user_stores).joinedload(UserStores.store)
-        )
-        .filter(Users.id == user_id)
-        .first()
-    )
+def get_user(user_id: str, request: Request, response: Response, db: Session = Depends(get_db)):
+    user_query = db.query(Users).filter(Users.id == user_id)
+    not_modified = conditional_get(request, user_query, Users)
+    if not_modified is not None:
+        return not_modified
+
+    user = user_query.options(*USER_RESPONSE_OPTIONS).first()
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
-    roles_list = [convert_role_to_baserole(user_role.role, db) for user_role in user.roles]
-    stores_list = [convert_store_to_basestore(user_store.store) for user_store in user.user_stores]
-    user_response = UserResponse(
-        id=user.id,
-        name=user.name,
-        email=user.email,
-        cross_store_allowed=user.cross_store_allowed,
-        user_stores=stores_list,
-        user_roles=roles_list
-    )
+    # updated_at is bumped whenever an embedded role, permission or store changes (see touch_users)
+    response.headers.update(entity_version_headers(user.id, user.updated_at))
+    user_response = convert_user_to_userresponse(user)
 
     return user_response
 
 @router.get("/store/{store_id}", response_model = List[UserResponse])
-async def get_users_by_store(
+def get_users_by_store(
     request: Request,
     response: Response, 
     store_id: str, 
@@ -95,49 +78,34 @@ async def get_users_by_store(
     page: int = Query(1, ge=1),
     page_size: int = Query(20, ge=1, le=100),
     order_by: str = Query("created_at", description=f"Field to sort by. Allowed fields: {', '.join(SORTABLE_FIELDS_USERS.keys())}"), 
-    order_dir: Literal['asc', 'desc'] = Query("desc", description="Sort direction (asc/desc)") 
+    order_dir: Literal['asc', 'desc'] = Query("desc", description="Sort direction (asc/desc)"),
+    cursor: str|None = Query(None, description="Keyset pagination cursor. Send it empty to start, then follow X-Next-Page. Skips the total count; page is ignored"),
 ):
-    offset = (page - 1) * page_size
-    users_query = users = (
+    users_query = (
         db.query(Users)
-        .options(
-            joinedload(Users.roles).joinedload(UserRoles.role),
-            joinedload(Users.user_stores).joinedload(UserStores.store)
-        )
+        .options(*USER_RESPONSE_OPTIONS)
+        .filter(Users.user_stores.any(UserStores.store_id == store_id))
     )
-    calculate_next_and_last_pages(users_query, page_size, page, request, response)
-    users_query = order_by_parameter(order_by, order_dir, SORTABLE_FIELDS_USERS, users_query)
 
-    users = users_query.filter(UserStores.store_id == store_id).offset(offset).limit(page_size).all()
+    users = paginate(users_query, SORTABLE_FIELDS_USERS, order_by, order_dir, page, page_size, cursor, request, response)
     
-    user_responses = []
-    for user in users:
-      roles_list = [convert_role_to_baserole(user_role.role, db) for user_role in user.roles]
-      stores_list = [convert_store_to_basestore(user_store.store) for user_store in user.user_stores]
-      user_response = UserResponse(
-            id=user.id,
-            name=user.name,
-            email=user.email,
-            cross_store_allowed=user.cross_store_allowed,
-            user_stores=stores_list,
-            user_roles=roles_list
-        )
-      user_responses.append(user_response)
-
-    return user_responses
+    return json_list_response(USER_LIST_ADAPTER, convert_users_to_userresponses(users), response)
 
 @router.post("", response_model=UserResponse)
 async def create_user(user: UserCreate, db: Session = Depends(get_db)):
-    invalid_stores = validate_ids(user.user_stores, Stores, db)
+    # bcrypt is awaited on its own pool, so only the database work takes a threadpool slot
+    user.password = await hash_string_async(user.password)
+    return await run_in_threadpool(insert_user, user, db)
+
+def insert_user(user: UserCreate, db: Session) -> UserResponse:
+    invalid_stores, stores = validate_ids(user.user_stores, Stores, db)
     if len(invalid_stores) > 0:
         raise HTTPException(status_code=404, detail=f"Stores with the following ids were not found: {invalid_stores}")
     
-    invalid_roles = validate_ids(user.user_roles, Roles, db)
+    invalid_roles, roles = validate_ids(user.user_roles, Roles, db)
     if len(invalid_roles) > 0:
         raise HTTPException(status_code=404, detail=f"Roles with the following ids were not found: {invalid_roles}")
     
-    user.password = hash_string(user.password)
-
     new_user = Users(**user.model_dump(exclude=[
         "user_stores",
         "user_roles"
@@ -145,32 +113,31 @@ async def create_user(user: UserCreate, db: Session = Depends(get_db)):
         
 
     db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    db.flush()
     
-    for store_id in user.user_stores:
+    for store_id in stores:
         user_store = UserStores(user_id=new_user.id, store_id=store_id)
         db.add(user_store)
     
-    for role_id in user.user_roles:
+    for role_id in roles:
         user_role = UserRoles(user_id=new_user.id, role_id=role_id)
         db.add(user_role)
     
+    # Built before commit so the already loaded stores and roles aren't expired and re-queried
+    user_response = convert_usercreate_to_userresponse(new_user, user, stores, roles)
     db.commit()
-    return convert_usercreate_to_userresponse(new_user, user, db)
+    invalidate_counts(Users)
+    return user_response
 
 
 @router.patch(
     "/{user_id}/stores",
     response_model=UserResponse
 )
-async def patch_user_stores(user_id:str, user_stores:UserStorePatch, db:Session = Depends(get_db)):
+def patch_user_stores(user_id:str, user_stores:UserStorePatch, db:Session = Depends(get_db)):
     user_model = (
         db.query(Users)
-        .options(
-            joinedload(Users.roles).joinedload(UserRoles.role),
-            joinedload(Users.user_stores).joinedload(UserStores.store)
-        )
+        .options(*USER_RESPONSE_OPTIONS)
         .filter(Users.id == user_id)
         .first()
     )
@@ -180,7 +147,7 @@ async def patch_user_stores(user_id:str, user_stores:UserStorePatch, db:Session
     if not user_stores.user_stores:
         raise HTTPException(status_code=400, detail="No body provided")
 
-    invalid_stores = validate_ids(user_stores.user_stores, Stores, db)
+    invalid_stores, _ = validate_ids(user_stores.user_stores, Stores, db)
     if len(invalid_stores) > 0:
         raise HTTPException(status_code=404, detail=f"Stores with the following ids were not found: {invalid_stores}")
     
@@ -207,27 +174,19 @@ async def patch_user_stores(user_id:str, user_stores:UserStorePatch, db:Session
                             .filter(Roles.store_id == store_id)
                             .all()]))
                             .delete())
+    # Store and role links are part of the user's representation
+    user_model.updated_at = utc_now()
     db.commit()
+    invalidate_user_permissions(user_model.id)
+    invalidate_counts(Users)
     updated_user = (
         db.query(Users)
-        .options(
-            joinedload(Users.roles).joinedload(UserRoles.role),
-            joinedload(Users.user_stores).joinedload(UserStores.store)
-        )
+        .options(*USER_RESPONSE_OPTIONS)
         .filter(Users.id == user_id)
         .first()
     )
 
-    roles_list = [convert_role_to_baserole(user_role.role, db) for user_role in updated_user.roles]
-    stores_list = [convert_store_to_basestore(user_store.store) for user_store in updated_user.user_stores]
-    user_response = UserResponse(
-        id=updated_user.id,
-        name=updated_user.name,
-        email=updated_user.email,
-        cross_store_allowed=updated_user.cross_store_allowed,
-        user_stores=stores_list,
-        user_roles=roles_list
-    )
+    user_response = convert_user_to_userresponse(updated_user)
     
     return user_response
 
@@ -236,13 +195,10 @@ async def patch_user_stores(user_id:str, user_stores:UserStorePatch, db:Session
     "/{user_id}/roles",
     response_model=UserResponse
 )
-async def patch_user_roles(user_id:str, user_roles:UserRolePatch, db:Session = Depends(get_db)):
+def patch_user_roles(user_id:str, user_roles:UserRolePatch, db:Session = Depends(get_db)):
     user_model = (
         db.query(Users)
-        .options(
-            joinedload(Users.roles).joinedload(UserRoles.role),
-            joinedload(Users.user_stores).joinedload(UserStores.store)
-        )
+        .options(*USER_RESPONSE_OPTIONS)
         .filter(Users.id == user_id)
         .first()
     )
@@ -252,7 +208,7 @@ async def patch_user_roles(user_id:str, user_roles:UserRolePatch, db:Session = D
     if not user_roles.user_roles:
         raise HTTPException(status_code=400, detail="No roles provided")
     
-    invalid_roles = validate_ids(user_roles.user_roles, Roles, db)
+    invalid_roles, roles = validate_ids(user_roles.user_roles, Roles, db)
     if len(invalid_roles) > 0:
         raise HTTPException(status_code=404, detail=f"Roles with the following ids were not found: {invalid_roles}")
     
@@ -261,7 +217,7 @@ async def patch_user_roles(user_id:str, user_roles:UserRolePatch, db:Session = D
     
     for role_id in user_roles.user_roles:
         if role_id not in current_role_ids:
-            role_store = db.query(Roles).filter(Roles.id == role_id).first().store_id
+            role_store = roles[role_id].store_id
             
             if role_store not in current_store_ids:
                 raise HTTPException(status_code=403, detail="User isn't assigned to the store that the role belongs to")
@@ -278,38 +234,31 @@ async def patch_user_roles(user_id:str, user_roles:UserRolePatch, db:Session = D
             )
             db.delete(user_role)
 
+    user_model.updated_at = utc_now()
     db.commit()
+    invalidate_user_permissions(user_model.id)
     updated_user = (
         db.query(Users)
-        .options(
-            joinedload(Users.roles).joinedload(UserRoles.role),
-            joinedload(Users.user_stores).joinedload(UserStores.store)
-        )
+        .options(*USER_RESPONSE_OPTIONS)
         .filter(Users.id == user_id)
         .first()
     )
 
-    roles_list = [convert_role_to_baserole(user_role.role, db) for user_role in updated_user.roles]
-    stores_list = [convert_store_to_basestore(user_store.store) for user_store in updated_user.user_stores]
-    user_response = UserResponse(
-        id=updated_user.id,
-        name=updated_user.name,
-        email=updated_user.email,
-        user_stores=stores_list,
-        user_roles=roles_list
-    )
+    user_response = convert_user_to_userresponse(updated_user)
     
     return user_response
 
 
 @router.put("/{user_id}", response_model=UserResponse)
 async def update_user(user_id: str, user: UserUpdate, db: Session = Depends(get_db)):
+    if user.password is not None:
+        user.password = await hash_string_async(user.password)
+    return await run_in_threadpool(apply_user_update, user_id, user, db)
+
+def apply_user_update(user_id: str, user: UserUpdate, db: Session) -> UserResponse:
     user_model = (
         db.query(Users)
-        .options(
-            joinedload(Users.roles).joinedload(UserRoles.role),
-            joinedload(Users.user_stores).joinedload(UserStores.store)
-        )
+        .options(*USER_RESPONSE_OPTIONS)
         .filter(Users.id == user_id)
         .first()
     )
@@ -319,37 +268,23 @@ async def update_user(user_id: str, user: UserUpdate, db: Session = Depends(get_
     
     for key,value in user.model_dump().items():
         if value is not None:
-            if key == "password":
-                value = hash_string(value)
             setattr(user_model, key, value)
 
     db.commit()
 
     user_model = (
         db.query(Users)
-        .options(
-            joinedload(Users.roles).joinedload(UserRoles.role),
-            joinedload(Users.user_stores).joinedload(UserStores.store)
-        )
+        .options(*USER_RESPONSE_OPTIONS)
         .filter(Users.id == user_id)
         .first()
     )
 
-    roles_list = [convert_role_to_baserole(user_role.role, db) for user_role in user_model.roles]
-    stores_list = [convert_store_to_basestore(user_store.store) for user_store in user_model.user_stores]
-    user_response = UserResponse(
-        id=user_model.id,
-        name=user_model.name,
-        email=user_model.email,
-        cross_store_allowed=user_model.cross_store_allowed,
-        user_stores=stores_list,
-        user_roles=roles_list
-    )
+    user_response = convert_user_to_userresponse(user_model)
     
     return user_response
 
 @router.delete("/{user_id}", status_code=204)
-async def delete_user(user_id:str, db:Session = Depends(get_db)):
+def delete_user(user_id:str, db:Session = Depends(get_db)):
     user = db.query(Users).filter(Users.id == user_id).first()
     user_roles = db.query(UserRoles).filter(UserRoles.user_id == user_id).all()
     user_stores = db.query(UserStores).filter(UserStores.user_id == user_id).all()
@@ -361,4 +296,6 @@ async def delete_user(user_id:str, db:Session = Depends(get_db)):
     
     db.delete(user)
     db.commit()
+    invalidate_user_permissions(user_id)
+    invalidate_counts(Users)
     return
\ No newline at end of file
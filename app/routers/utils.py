@@ -1,20 +1,43 @@
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, selectinload
 from sqlalchemy.orm.query import Query
-from app.database.models import Permissions, Roles, Stores, Base, Users
-from typing import List
+from app.database.models import Permissions, Roles, Stores, Base, Users, RolePermissions, UserRoles, UserStores
+from app.database.models.base_models import utc_now
+from app.database.models.stats_models import STORE_STATS_ENTITIES, estimate_store_count
+from app.cache import TTLCache
+from typing import List, Dict, Tuple
 from app.schemas.users_schemas import BaseRole, BasePermission, BaseStore, UserCreate, UserResponse
 from sqlalchemy.inspection import inspect
-import math
+from sqlalchemy import String, and_, func, or_, select, type_coerce
+from sqlalchemy.sql import operators
+from sqlalchemy.sql.elements import BinaryExpression, BindParameter, BooleanClauseList
+import math, json, base64, binascii
 from fastapi import Request, Response, HTTPException
+from pydantic import TypeAdapter
 
-def validate_ids(ids_list: List[str|None], model: Base, db: Session)-> list[str|None]:
-    invalid_ids = list()
-    for id in ids_list:
-        item = db.query(model).filter(model.id == id).first()
-        if not item:
-            invalid_ids.append(id)
-    
-    return invalid_ids
+# SQLite builds before 3.32 cap bound parameters at 999 per statement
+VALIDATE_IDS_CHUNK_SIZE = 500
+
+COUNT_CACHE_TTL_SECONDS = 10
+COUNT_CACHE_MAX_ENTRIES = 2048
+
+# (table name, compiled statement, bound params) -> total rows
+count_cache = TTLCache(maxsize=COUNT_CACHE_MAX_ENTRIES, ttl=COUNT_CACHE_TTL_SECONDS)
+
+def validate_ids(ids_list: List[str|None], model: Base, db: Session)-> Tuple[List[str|None], Dict[str, Base]]:
+    """
+    Loads every requested id with chunked IN queries.
+    Returns the ids that were not found and the loaded rows keyed by id, so callers
+    can reuse them instead of querying again.
+    """
+    unique_ids = list(dict.fromkeys(ids_list))
+    found_items = dict()
+    for start in range(0, len(unique_ids), VALIDATE_IDS_CHUNK_SIZE):
+        chunk = unique_ids[start:start + VALIDATE_IDS_CHUNK_SIZE]
+        for item in db.query(model).filter(model.id.in_(chunk)).all():
+            found_items[item.id] = item
+
+    invalid_ids = [id for id in unique_ids if id not in found_items]
+    return invalid_ids, found_items
 
 
 def convert_store_to_basestore(store):
@@ -24,16 +47,26 @@ def convert_store_to_basestore(store):
     }
     return BaseStore(**store_data)
 
-def convert_role_to_baserole(role: Roles, db: Session) -> BaseRole:
-    permissions_list = []
-    for rp in role.permissions:  # Assuming 'permissions' is the backref from RolePermissions
-        permission = db.query(Permissions).filter(Permissions.id == rp.permission_id).first()
-        if permission:
-            permission_data = {
-                column.name: getattr(permission, column.name)
-                for column in inspect(Permissions).c
-            }
-            permissions_list.append(BasePermission(**permission_data))
+ROLE_PERMISSIONS_OPTION = selectinload(Roles.permissions).selectinload(RolePermissions.permission)
+
+def convert_permission_to_basepermission(permission: Permissions) -> BasePermission:
+    permission_data = {
+        column.name: getattr(permission, column.name)
+        for column in inspect(Permissions).c
+    }
+    return BasePermission(**permission_data)
+
+def convert_role_to_baserole(role: Roles) -> BaseRole:
+    """
+    Serializes a role with its permissions through the RolePermissions.permission
+    relationship. Load roles with ROLE_PERMISSIONS_OPTION (or an equivalent eager
+    load) so this doesn't issue a query per permission.
+    """
+    permissions_list = [
+        convert_permission_to_basepermission(rp.permission)
+        for rp in role.permissions
+        if rp.permission
+    ]
 
     return BaseRole(
         id=role.id,
@@ -45,11 +78,41 @@ def convert_role_to_baserole(role: Roles, db: Session) -> BaseRole:
     )
 
 
-def convert_usercreate_to_userresponse(new_user:Users, user: UserCreate, db: Session) -> UserResponse:
+def convert_user_to_userresponse(user: Users, converted_roles: Dict[str, BaseRole]|None = None) -> UserResponse:
+    """
+    converted_roles memoizes serialized roles by id, so a role shared by many users
+    on the same page is only converted once.
+    """
+    if converted_roles is None:
+        converted_roles = dict()
+
+    roles_list = []
+    for user_role in user.roles:
+        role = user_role.role
+        if role.id not in converted_roles:
+            converted_roles[role.id] = convert_role_to_baserole(role)
+        roles_list.append(converted_roles[role.id])
+
+    stores_list = [convert_store_to_basestore(user_store.store) for user_store in user.user_stores]
+    return UserResponse(
+        id=user.id,
+        name=user.name,
+        email=user.email,
+        cross_store_allowed=user.cross_store_allowed,
+        user_stores=stores_list,
+        user_roles=roles_list
+    )
+
+def convert_users_to_userresponses(users: List[Users]) -> List[UserResponse]:
+    converted_roles = dict()
+    return [convert_user_to_userresponse(user, converted_roles) for user in users]
+
+
+def convert_usercreate_to_userresponse(new_user:Users, user: UserCreate, stores: Dict[str, Stores], roles: Dict[str, Roles]) -> UserResponse:
     stores_list = []
     roles_list = []
-    for store in user.user_stores:
-        store = db.query(Stores).filter(Stores.id == store).first()
+    for store_id in dict.fromkeys(user.user_stores):
+        store = stores.get(store_id)
         if store:
             store_data = {
                 column.name: getattr(store, column.name)
@@ -57,8 +120,8 @@ def convert_usercreate_to_userresponse(new_user:Users, user: UserCreate, db: Ses
             }
             stores_list.append(BaseStore(**store_data))
 
-    for role in user.user_roles:
-        role = db.query(Roles).filter(Roles.id == role).first()
+    for role_id in dict.fromkeys(user.user_roles):
+        role = roles.get(role_id)
         if role:
             role_data = {
                 column.name: getattr(role, column.name)
@@ -70,6 +133,7 @@ def convert_usercreate_to_userresponse(new_user:Users, user: UserCreate, db: Ses
         id=new_user.id,
         name=new_user.name,
         email=new_user.email,
+        cross_store_allowed=new_user.cross_store_allowed,
         user_stores=stores_list,
         user_roles=roles_list
     )
@@ -82,8 +146,61 @@ def filter_by_store(db_query:Query, object:Base, user:Users):
         print(f'Encountered the following exception: {e}. Returning unfiltered query')
         return db_query
 
-def calculate_next_and_last_pages(query:Query, page_size:int, page:int, request:Request, response:Response):
-    total_elements = query.count() 
+def touch_users(db:Session, *criteria) -> None:
+    """
+    Bumps updated_at on the users matching criteria. A user's representation embeds
+    its roles, their permissions and its stores, so changes to any of those have to
+    move the user's validators (GET /users/{id} only projects the user row).
+    """
+    db.query(Users).filter(*criteria).update({Users.updated_at: utc_now()}, synchronize_session=False)
+
+def users_with_role(role_id:str):
+    return Users.roles.any(UserRoles.role_id == role_id)
+
+def users_with_permission(permission_id:str):
+    role_ids = select(RolePermissions.role_id).where(RolePermissions.permission_id == permission_id)
+    return Users.roles.any(UserRoles.role_id.in_(role_ids))
+
+def users_in_store(store_id:str):
+    return Users.user_stores.any(UserStores.store_id == store_id)
+
+def visible_store_ids(user:Users, store_id:str|None = None) -> set[str]|None:
+    """
+    Stores a listing can return rows from, or None when it isn't restricted to any.
+    """
+    store_ids = None if user.cross_store_allowed else {store.id for store in user.stores}
+    if store_id is not None:
+        store_ids = {store_id} if store_ids is None else store_ids & {store_id}
+    return store_ids
+
+def _count_cache_key(query:Query) -> tuple:
+    compiled = query.statement.compile()
+    params = tuple(sorted(
+        (name, tuple(value) if isinstance(value, list) else value)
+        for name, value in compiled.params.items()
+    ))
+    return (query.column_descriptions[0]["entity"].__tablename__, str(compiled), params)
+
+def cached_count(query:Query) -> int:
+    key = _count_cache_key(query)
+    total_elements = count_cache.get(key)
+    if total_elements is None:
+        total_elements = query.count()
+        count_cache.set(key, total_elements)
+    return total_elements
+
+def invalidate_counts(model:Base) -> None:
+    """
+    Drops the cached totals of a table. Call it after committing inserts or deletes.
+    Only this worker's cache is cleared; other workers keep their totals for up to
+    COUNT_CACHE_TTL_SECONDS, which is acceptable for X-Last-Page.
+    """
+    table_name = model.__tablename__
+    count_cache.invalidate_where(lambda key: key[0] == table_name)
+
+def calculate_next_and_last_pages(query:Query, page_size:int, page:int, request:Request, response:Response, total_elements:int|None = None):
+    if total_elements is None:
+        total_elements = cached_count(query)
     
     if total_elements > 0:
         last_page_num = math.ceil(total_elements / page_size)
@@ -92,12 +209,12 @@ def calculate_next_and_last_pages(query:Query, page_size:int, page:int, request:
     
     base_url = request.url.remove_query_params('page')
 
-    last_page_url = str(base_url.replace_query_params(page=last_page_num))
+    last_page_url = str(base_url.include_query_params(page=last_page_num))
     response.headers["x-Last-Page"] = last_page_url 
 
     if page < last_page_num:
         next_page_num = page + 1
-        next_page_url = str(base_url.replace_query_params(page=next_page_num))
+        next_page_url = str(base_url.include_query_params(page=next_page_num))
         response.headers["x-Next-Page"] = next_page_url
 
 def order_by_parameter(order_by:str, order_dir:str, sortable_fields:list, query:Query):
@@ -114,4 +231,159 @@ def order_by_parameter(order_by:str, order_dir:str, sortable_fields:list, query:
     else: # 'asc'
         query = query.order_by(sort_column.asc())
 
-    return query
\ No newline at end of file
+    return query
+
+
+def encode_cursor(last_value, last_id:str, order_by:str, order_dir:str) -> str:
+    payload = json.dumps({"value": last_value, "id": last_id, "order_by": order_by, "order_dir": order_dir}, separators=(",", ":"), default=str)
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor:str, order_by:str, order_dir:str) -> tuple:
+    """
+    Returns the (sort value, id) of the last row of the previous page.
+    """
+    try:
+        padded_cursor = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded_cursor.encode()))
+        last_value, last_id = payload["value"], payload["id"]
+    except (binascii.Error, ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    if payload.get("order_by") != order_by or payload.get("order_dir") != order_dir:
+        raise HTTPException(status_code=400, detail="Cursor was issued for a different order_by/order_dir")
+    return last_value, last_id
+
+def stored_value(sort_column):
+    """
+    sort_column without result/bind processing: values come back and are compared
+    exactly as stored (e.g. SQLite DateTime text, with or without microseconds),
+    so they survive a round trip through the JSON cursor unchanged.
+    """
+    return type_coerce(sort_column, String)
+
+def keyset_condition(sort_column, id_column, last_value, last_id:str, order_dir:str):
+    """
+    Rows strictly after (last_value, last_id) in (sort_column, id) order, using the
+    values the cursor was issued with, so deleting or editing that row in between
+    doesn't move the page boundary. NULLs sort first ascending and last descending.
+    """
+    sort_column = stored_value(sort_column)
+
+    if order_dir == "desc":
+        if last_value is None:
+            return and_(sort_column.is_(None), id_column < last_id)
+        return or_(
+            sort_column < last_value,
+            and_(sort_column == last_value, id_column < last_id),
+            sort_column.is_(None),
+        )
+    if last_value is None:
+        return or_(sort_column.is_not(None), and_(sort_column.is_(None), id_column > last_id))
+    return or_(
+        sort_column > last_value,
+        and_(sort_column == last_value, id_column > last_id),
+    )
+
+def cursor_paginate(query:Query, sortable_fields:dict, order_by:str, order_dir:str, cursor:str, page_size:int, request:Request, response:Response) -> list:
+    """
+    Keyset pagination on (order_by column, id). An empty cursor starts from the
+    beginning; the cursor for the following page is sent in X-Next-Page. No total
+    count is computed, so X-Last-Page is not set.
+    """
+    if order_by not in sortable_fields:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid order_by field: {order_by}. Allowed fields are: {', '.join(sortable_fields.keys())}"
+        )
+
+    sort_column = sortable_fields[order_by]
+    id_column = query.column_descriptions[0]["entity"].id
+
+    if cursor:
+        last_value, last_id = decode_cursor(cursor, order_by, order_dir)
+        query = query.filter(keyset_condition(sort_column, id_column, last_value, last_id, order_dir))
+
+    if order_dir == "desc":
+        query = query.order_by(sort_column.desc().nulls_last(), id_column.desc())
+    else: # 'asc'
+        query = query.order_by(sort_column.asc().nulls_first(), id_column.asc())
+
+    rows = query.add_columns(stored_value(sort_column)).limit(page_size + 1).all()
+    items = [item for item, _ in rows[:page_size]]
+    if len(rows) > page_size:
+        last_item, last_value = rows[page_size - 1]
+        next_cursor = encode_cursor(last_value, last_item.id, order_by, order_dir)
+        next_page_url = str(request.url.remove_query_params('page').include_query_params(cursor=next_cursor))
+        response.headers["x-Next-Page"] = next_page_url
+
+    return items
+
+def only_store_filtered(query:Query, model:Base, store_ids:set[str]|None) -> bool:
+    """
+    Whether the WHERE clause of query is the store filter for store_ids and nothing
+    else: no criteria when store_ids is None, otherwise store_id = / IN conditions whose
+    intersection is store_ids. Only then can store_stats stand in for its COUNT.
+    """
+    criteria = query.whereclause
+    if criteria is None:
+        return store_ids is None
+    if isinstance(criteria, BooleanClauseList) and criteria.operator is operators.and_:
+        clauses = criteria.clauses
+    else:
+        clauses = [criteria]
+
+    store_id_column = model.__table__.c.store_id
+    filtered_ids = None
+    for clause in clauses:
+        if not (isinstance(clause, BinaryExpression) and isinstance(clause.right, BindParameter)
+                and clause.left.compare(store_id_column)):
+            return False
+        if clause.operator is operators.eq:
+            values = {clause.right.value}
+        elif clause.operator is operators.in_op:
+            values = set(clause.right.value)
+        else:
+            return False
+        filtered_ids = values if filtered_ids is None else filtered_ids & values
+    return store_ids is not None and filtered_ids == set(store_ids)
+
+def estimate_count(query:Query, model:Base, store_ids:set[str]|None) -> int:
+    """
+    store_stats total for a query that passed only_store_filtered. Rows without a store
+    (global roles) aren't counted there, so they are added when every store is visible.
+    """
+    total_elements = estimate_store_count(query.session, model.__tablename__, store_ids)
+    if store_ids is None and model.__table__.c.store_id.nullable:
+        total_elements += query.session.query(func.count(model.id)).filter(model.store_id.is_(None)).scalar()
+    return total_elements
+
+def paginate(query:Query, sortable_fields:dict, order_by:str, order_dir:str, page:int, page_size:int, cursor:str|None, request:Request, response:Response,
+             exact_count:bool = True, store_ids:set[str]|None = None) -> list:
+    """
+    Runs a list query with either page/offset pagination (default) or keyset
+    pagination when a cursor is provided.
+    With exact_count=False, store-scoped tables whose only filters are the store_ids
+    (checked by only_store_filtered) take their total from the store_stats counters
+    instead of a COUNT query; any other query is counted exactly.
+    """
+    if cursor is not None:
+        return cursor_paginate(query, sortable_fields, order_by, order_dir, cursor, page_size, request, response)
+
+    total_elements = None
+    model = query.column_descriptions[0]["entity"]
+    if not exact_count and model.__tablename__ in STORE_STATS_ENTITIES and only_store_filtered(query, model, store_ids):
+        total_elements = estimate_count(query, model, store_ids)
+
+    calculate_next_and_last_pages(query, page_size, page, request, response, total_elements)
+    query = order_by_parameter(order_by, order_dir, sortable_fields, query)
+    return query.offset((page - 1) * page_size).limit(page_size).all()
+
+def json_list_response(adapter:TypeAdapter, items:list, response:Response) -> Response:
+    """
+    Serializes items (ORM objects or schemas) straight to JSON bytes with adapter,
+    instead of FastAPI validating them against response_model and encoding the result
+    again. Headers set on response, such as X-Next-Page, are kept.
+    """
+    body = adapter.dump_json(adapter.validate_python(items, from_attributes=True))
+    return Response(content=body, media_type="application/json", headers=dict(response.headers),
+                    status_code=response.status_code or 200)
@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import List, Optional
 from app.schemas.customers_schemas import BaseCustomer
 from app.schemas.base_schema import BaseSchema
@@ -42,6 +42,18 @@ class OrderCreate(BaseModel):
         orm_mode = True
 
 
+ORDER_BATCH_MAX_SIZE = 500
+
+class OrderBatchCreate(BaseModel):
+    orders: List[OrderCreate] = Field(min_length=1, max_length=ORDER_BATCH_MAX_SIZE)
+
+class OrderBatchItemResult(BaseModel):
+    index: int
+    status_code: int
+    order: Optional[BaseOrder] = None
+    detail: Optional[str] = None
+
+
 class OrderUpdate(BaseModel):
     customer_id: Optional[str] = None
     total: Optional[float] = None
@@ -15,4 +15,12 @@ class StoreUpdate(BaseModel):
     address: Optional[str] = None
 
     class Config:
-        orm_mode = True
\ No newline at end of file
+        orm_mode = True
+
+class StoreStatsResponse(BaseModel):
+    store_id: str
+    name: str
+    products_count: int
+    customers_count: int
+    orders_count: int
+    roles_count: int
@@ -0,0 +1,29 @@
+import os
+from pydantic import BaseModel
+
+def _env_flag(name:str, default:bool = True) -> bool:
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+class Settings(BaseModel):
+    """
+    Startup side effects run by create_app's lifespan hook. All of them are on by default;
+    turning them all off builds an app that touches neither the database nor the log file.
+    """
+    sqlite_logging: bool = True
+    create_schema: bool = True
+    sync_views: bool = True
+    build_permissions: bool = True
+    seed_data: bool = True
+
+    @classmethod
+    def from_env(cls) -> "Settings":
+        return cls(
+            sqlite_logging=_env_flag("STARTUP_SQLITE_LOGGING"),
+            create_schema=_env_flag("STARTUP_CREATE_SCHEMA"),
+            sync_views=_env_flag("STARTUP_SYNC_VIEWS"),
+            build_permissions=_env_flag("STARTUP_BUILD_PERMISSIONS"),
+            seed_data=_env_flag("STARTUP_SEED_DATA"),
+        )
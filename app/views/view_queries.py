@@ -4,10 +4,11 @@ from .view_schemas import View
 
 CUSTOMERS_PRODUCTS_ORDERS_COUNT_VIEW:View = View(name='customers_products_orders_count',
                                                 query="""
-                                                select s.name, count(distinct c.id) customers_count, count(distinct p.id) products_count, count(distinct o.id) orders_count
+                                                select s.name,
+                                                       coalesce(sum(case when st.entity = 'customers' then st.row_count end), 0) customers_count,
+                                                       coalesce(sum(case when st.entity = 'products' then st.row_count end), 0) products_count,
+                                                       coalesce(sum(case when st.entity = 'orders' then st.row_count end), 0) orders_count
                                                 from stores s
-                                                left join customers c on c.store_id = s.id
-                                                left join products p on p.store_id = s.id
-                                                left join orders o on o.store_id = s.id
-                                                group by 1;
+                                                left join store_stats st on st.store_id = s.id
+                                                group by s.id, s.name;
                                                 """)
\ No newline at end of file
@@ -1,5 +1,7 @@
+import hashlib
 from app.database.database import engine
-from sqlalchemy import text, inspect
+from app.database.models import ViewVersions
+from sqlalchemy import text, inspect, select, delete, insert
 from .view_queries import CUSTOMERS_PRODUCTS_ORDERS_COUNT_VIEW
 from .view_schemas import View
 from typing import List
@@ -7,16 +9,31 @@ from typing import List
 default_views:List[View] = [CUSTOMERS_PRODUCTS_ORDERS_COUNT_VIEW,
                             ]
 
-def create_or_replace_view(view:View):
-    resulting_query = f"CREATE VIEW {view.name} AS {view.query}"
+def view_definition_hash(view:View) -> str:
+    normalized_query = " ".join(view.query.split())
+    return hashlib.sha256(f"{view.name}:{normalized_query}".encode()).hexdigest()
+
+def create_or_replace_view(view:View) -> bool:
+    """
+    Recreates the view only if its definition changed since it was last created, or if
+    it is missing. Returns whether any DDL ran.
+    """
+    definition_hash = view_definition_hash(view)
     with engine.connect() as conn:
-        inspector = inspect(conn)
-        if inspector.has_table(view.name):
-            conn.execute(text(f"DROP VIEW {view.name}"))
+        stored_hash = conn.execute(
+            select(ViewVersions.definition_hash).where(ViewVersions.name == view.name)
+        ).scalar()
+        if stored_hash == definition_hash and inspect(conn).has_table(view.name):
+            return False
 
-        conn.execute(text(resulting_query))
+        conn.execute(text(f"DROP VIEW IF EXISTS {view.name}"))
+        conn.execute(text(f"CREATE VIEW {view.name} AS {view.query}"))
+        conn.execute(delete(ViewVersions).where(ViewVersions.name == view.name))
+        conn.execute(insert(ViewVersions).values(name=view.name, definition_hash=definition_hash))
         conn.commit()
+        return True
 
 def create_default_views():
     for view in default_views:
-        create_or_replace_view(view)
\ No newline at end of file
+        if create_or_replace_view(view):
+            print(f"View {view.name} created with definition {view_definition_hash(view)[:12]}")
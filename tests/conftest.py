@@ -0,0 +1,47 @@
+import os
+import tempfile
+
+# The database engines and the log level are read from the environment at import
+# time, so the test database has to be configured before anything imports app.
+TEST_DATA_DIR = tempfile.mkdtemp(prefix="ecommerce-backend-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(TEST_DATA_DIR, 'app.db')}"
+os.environ["DATABASE_READ_URL"] = os.environ["DATABASE_URL"]
+os.environ["BOOTSTRAP_LOCK_FILE"] = os.path.join(TEST_DATA_DIR, "bootstrap.lock")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+import pytest
+from fastapi.testclient import TestClient
+from app.main import create_app
+from app.settings import Settings
+from tests.helpers import unique_name
+
+ADMIN_CREDENTIALS = {"username": "admin@admin.com", "password": "admin"}
+
+def pytest_configure(config):
+    config.addinivalue_line("markers", "benchmark: timing comparison, prints its numbers with pytest -s")
+
+@pytest.fixture(scope="session")
+def app():
+    return create_app(Settings(sqlite_logging=False))
+
+@pytest.fixture(scope="session")
+def client(app):
+    """
+    One client for the whole session. Entering it runs the lifespan, which creates
+    the schema, the permissions and the admin user in the temporary database.
+    """
+    with TestClient(app) as client:
+        yield client
+
+@pytest.fixture(scope="session")
+def auth_headers(client) -> dict:
+    response = client.post("/auth/login", data=ADMIN_CREDENTIALS)
+    assert response.status_code == 200, response.text
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+@pytest.fixture
+def store(client, auth_headers) -> dict:
+    """A new, empty store, so tests don't see each other's rows."""
+    response = client.post("/stores", headers=auth_headers, json={"name": unique_name("store"), "address": "Test Address 1"})
+    assert response.status_code in (200, 201), response.text
+    return response.json()
@@ -0,0 +1,41 @@
+import asyncio
+import uuid
+import httpx
+from contextlib import contextmanager
+from sqlalchemy import event
+from app.database.database import engine, read_engine
+
+def unique_name(prefix:str) -> str:
+    return f"{prefix}-{uuid.uuid4().hex[:8]}"
+
+@contextmanager
+def count_statements():
+    """
+    Collects (statement, parameters) for every SQL statement sent through the writer
+    and reader engines.
+    """
+    statements = []
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    engines = {engine, read_engine}
+    for target in engines:
+        event.listen(target, "before_cursor_execute", record)
+    try:
+        yield statements
+    finally:
+        for target in engines:
+            event.remove(target, "before_cursor_execute", record)
+
+async def _send_all(app, requests:list[tuple]) -> list:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://testserver") as client:
+        return await asyncio.gather(*(client.request(method, url, **kwargs) for method, url, kwargs in requests))
+
+def send_concurrently(app, requests:list[tuple]) -> list[httpx.Response]:
+    """
+    Sends (method, url, kwargs) requests to app all at once from one event loop, the
+    way concurrent clients would reach a single worker. The app must already have
+    been started (see the client fixture).
+    """
+    return asyncio.run(_send_all(app, requests))
@@ -0,0 +1,149 @@
+import asyncio
+import threading
+import time
+import httpx
+import pytest
+from anyio import to_thread
+from jose import JWTError, jwt
+from app.auth.auth_utils import LOGIN_THROTTLE_MAX_FAILURES, login_failures_cache, login_throttled, record_login_failure
+from app.auth.hashing import HASHING_MAX_PENDING, HASHING_MAX_WORKERS
+from app.cache import TTLCache
+from app.auth.oauth2 import ALGORITHM, SECRET_KEY, create_access_token, verified_tokens_cache, verify_token_signature
+
+BENCHMARK_ITERATIONS = 2000
+ADMIN_LOGIN = {"username": "admin@admin.com", "password": "admin"}
+
+def test_verified_token_cache_counts_hits_and_misses():
+    token = create_access_token({"user_id": "cache-test"})
+    before = verified_tokens_cache.stats()
+
+    for _ in range(3):
+        assert verify_token_signature(token)["user_id"] == "cache-test"
+
+    after = verified_tokens_cache.stats()
+    assert after["misses"] - before["misses"] == 1
+    assert after["hits"] - before["hits"] == 2
+
+def test_cached_token_does_not_outlive_its_expiry():
+    expires_at = int(time.time()) + 1
+    token = jwt.encode({"user_id": "expiring", "exp": expires_at}, SECRET_KEY, algorithm=ALGORITHM)
+    verify_token_signature(token)
+
+    # jose compares exp with whole seconds, so wait until it is past for jose too
+    time.sleep(expires_at + 1.1 - time.time())
+    with pytest.raises(JWTError):
+        verify_token_signature(token)
+
+@pytest.mark.benchmark
+def test_warm_verification_skips_signature_work():
+    token = create_access_token({"user_id": "benchmark"})
+
+    start = time.perf_counter()
+    for _ in range(BENCHMARK_ITERATIONS):
+        jwt.decode(token, SECRET_KEY, algorithms=ALGORITHM)
+    cold = (time.perf_counter() - start) / BENCHMARK_ITERATIONS * 1_000_000
+
+    verify_token_signature(token)
+    start = time.perf_counter()
+    for _ in range(BENCHMARK_ITERATIONS):
+        verify_token_signature(token)
+    warm = (time.perf_counter() - start) / BENCHMARK_ITERATIONS * 1_000_000
+
+    print(f"\ntoken verification: {cold:.1f}us with jwt.decode, {warm:.1f}us from the cache "
+          f"(cache stats {verified_tokens_cache.stats()})")
+    assert warm < cold
+
+def test_repeated_failed_logins_are_throttled(client):
+    credentials = {"username": "nobody@example.com", "password": "wrong"}
+    statuses = [client.post("/auth/login", data=credentials).status_code for _ in range(6)]
+
+    assert statuses == [403] * 5 + [429]
+
+def test_failed_login_window_is_not_extended_by_later_failures(client, monkeypatch):
+    monkeypatch.setattr(login_failures_cache, "ttl", 1.0)
+    credentials = {"username": "window@example.com", "password": "wrong"}
+    for _ in range(LOGIN_THROTTLE_MAX_FAILURES - 1):
+        assert client.post("/auth/login", data=credentials).status_code == 403
+    time.sleep(0.6)
+    assert client.post("/auth/login", data=credentials).status_code == 403
+    assert client.post("/auth/login", data=credentials).status_code == 429
+
+    time.sleep(0.5) # past the window opened by the first failure, not the last one
+    assert client.post("/auth/login", data=credentials).status_code == 403
+
+def test_failures_from_one_client_dont_lock_out_others(client):
+    for _ in range(LOGIN_THROTTLE_MAX_FAILURES):
+        record_login_failure("admin@admin.com", "203.0.113.7")
+
+    assert login_throttled("admin@admin.com", "203.0.113.7")
+    assert not login_throttled("admin@admin.com", "testclient")
+    assert client.post("/auth/login", data=ADMIN_LOGIN).status_code == 200
+
+def test_ttl_cache_incr_is_atomic():
+    cache = TTLCache(maxsize=10, ttl=60)
+    threads, increments = 8, 2000
+    def hammer():
+        for _ in range(increments):
+            cache.incr("key")
+
+    workers = [threading.Thread(target=hammer) for _ in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    assert cache.get("key") == threads * increments
+
+async def login_storm(app, auth_headers:dict, logins:int, reads:int, thread_tokens:int|None = None) -> tuple[list, list[float], float]:
+    """
+    Fires logins all at once and, while they are running, GET /stores requests one
+    after another. Returns the login responses, each read's latency and the storm's duration.
+    thread_tokens shrinks AnyIO's threadpool, which sync handlers and dependencies share.
+    """
+    if thread_tokens is not None:
+        to_thread.current_default_thread_limiter().total_tokens = thread_tokens
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://testserver") as client:
+        async def timed_read() -> float:
+            start = time.perf_counter()
+            response = await client.get("/stores", headers=auth_headers)
+            assert response.status_code == 200
+            return time.perf_counter() - start
+
+        async def reads_during_storm() -> list[float]:
+            await asyncio.sleep(0.05)
+            return [await timed_read() for _ in range(reads)]
+
+        start = time.perf_counter()
+        login_responses = asyncio.gather(*(client.post("/auth/login", data=ADMIN_LOGIN) for _ in range(logins)))
+        latencies = await reads_during_storm()
+        responses = await login_responses
+        return responses, latencies, time.perf_counter() - start
+
+@pytest.mark.benchmark
+def test_other_endpoints_keep_their_latency_during_a_login_storm(app, client, auth_headers):
+    quiet_latency = min(asyncio.run(login_storm(app, auth_headers, logins=0, reads=5))[1])
+    logins = 2 * (HASHING_MAX_WORKERS + HASHING_MAX_PENDING)
+    responses, latencies, storm_duration = asyncio.run(login_storm(app, auth_headers, logins, reads=10))
+
+    statuses = [response.status_code for response in responses]
+    print(f"\n{logins} logins in {storm_duration:.2f}s ({statuses.count(200)} ok, {statuses.count(503)} rejected); "
+          f"GET /stores during the storm: max {max(latencies) * 1000:.0f}ms, quiet {quiet_latency * 1000:.0f}ms")
+
+    assert set(statuses) <= {200, 503}
+    assert statuses.count(200) >= HASHING_MAX_WORKERS
+    assert statuses.count(503) > 0
+    assert all(response.headers["Retry-After"] for response in responses if response.status_code == 503)
+    # The reads finish while the storm is still going instead of queueing behind bcrypt
+    assert sum(latencies) < storm_duration / 2
+
+@pytest.mark.benchmark
+def test_logins_waiting_on_bcrypt_leave_the_threadpool_free(app, client, auth_headers):
+    thread_tokens = 4
+    logins = 2 * thread_tokens
+    responses, latencies, storm_duration = asyncio.run(login_storm(app, auth_headers, logins, reads=10, thread_tokens=thread_tokens))
+
+    print(f"\n{logins} logins with a {thread_tokens}-thread pool took {storm_duration:.2f}s; "
+          f"meanwhile GET /stores ran at {len(latencies) / sum(latencies):.0f} req/s (max {max(latencies) * 1000:.0f}ms)")
+    assert [response.status_code for response in responses] == [200] * logins
+    # Logins await bcrypt instead of parking a threadpool thread, so reads aren't starved
+    assert sum(latencies) < storm_duration / 2
@@ -0,0 +1,105 @@
+import time
+from tests.helpers import count_statements, unique_name
+from tests.test_orders import create_customer, create_product
+from tests.test_users import create_user
+
+def assert_revalidation_returns(client, auth_headers, url:str, etag:str, status_code:int):
+    response = client.get(url, headers={**auth_headers, "If-None-Match": etag})
+    assert response.status_code == status_code, response.text
+    return response
+
+def test_order_etag_follows_its_customer(client, auth_headers, store):
+    customer = create_customer(client, auth_headers, store["id"])
+    product = create_product(client, auth_headers, store["id"], stock=5)
+    order = client.post("/orders", headers=auth_headers, json={
+        "store_id": store["id"], "customer_id": customer["id"],
+        "order_products": [{"product_id": product["id"], "quantity": 1}],
+    }).json()
+    url = f"/orders/{order['id']}"
+    etag = client.get(url, headers=auth_headers).headers["ETag"]
+    assert_revalidation_returns(client, auth_headers, url, etag, 304)
+
+    response = client.put(f"/customers/{customer['id']}", headers=auth_headers, json={"name": "Renamed customer"})
+    assert response.status_code == 200, response.text
+
+    response = assert_revalidation_returns(client, auth_headers, url, etag, 200)
+    assert response.json()["customer"]["name"] == "Renamed customer"
+    assert response.headers["ETag"] != etag
+
+def test_role_etag_follows_its_permissions(client, auth_headers, store):
+    permission = client.get("/permissions?page_size=1", headers=auth_headers).json()[0]
+    role = client.post("/roles", headers=auth_headers, json={
+        "name": unique_name("role"), "store_id": store["id"], "role_permissions": [permission["id"]],
+    }).json()
+    url = f"/roles/{role['id']}"
+    etag = client.get(url, headers=auth_headers).headers["ETag"]
+
+    description = unique_name("description")
+    response = client.put(f"/permissions/{permission['id']}", headers=auth_headers, json={"description": description})
+    assert response.status_code == 200, response.text
+
+    response = assert_revalidation_returns(client, auth_headers, url, etag, 200)
+    assert response.json()["role_permissions"][0]["description"] == description
+
+def test_user_etag_follows_its_stores(client, auth_headers, store):
+    user = create_user(client, auth_headers, store["id"])
+    url = f"/users/{user['id']}"
+    etag = client.get(url, headers=auth_headers).headers["ETag"]
+
+    response = client.put(f"/stores/{store['id']}", headers=auth_headers, json={"address": "New Address 2"})
+    assert response.status_code == 200, response.text
+
+    response = assert_revalidation_returns(client, auth_headers, url, etag, 200)
+    assert response.json()["user_stores"][0]["address"] == "New Address 2"
+
+def test_user_etag_follows_its_roles_and_permissions(client, auth_headers, store):
+    permission = client.get("/permissions?page_size=1", headers=auth_headers).json()[0]
+    role = client.post("/roles", headers=auth_headers, json={
+        "name": unique_name("role"), "store_id": store["id"], "role_permissions": [permission["id"]],
+    }).json()
+    user = create_user(client, auth_headers, store["id"], [role["id"]])
+    url = f"/users/{user['id']}"
+
+    etag = client.get(url, headers=auth_headers).headers["ETag"]
+    response = client.put(f"/roles/{role['id']}", headers=auth_headers, json={"name": unique_name("renamed")})
+    assert response.status_code == 200, response.text
+    assert_revalidation_returns(client, auth_headers, url, etag, 200)
+
+    etag = client.get(url, headers=auth_headers).headers["ETag"]
+    response = client.put(f"/permissions/{permission['id']}", headers=auth_headers, json={"description": unique_name("description")})
+    assert response.status_code == 200, response.text
+    assert_revalidation_returns(client, auth_headers, url, etag, 200)
+
+def test_user_revalidation_reads_only_the_user_row(client, auth_headers, store):
+    user = create_user(client, auth_headers, store["id"])
+    url = f"/users/{user['id']}"
+    etag = client.get(url, headers=auth_headers).headers["ETag"]
+
+    with count_statements() as statements:
+        assert_revalidation_returns(client, auth_headers, url, etag, 304)
+    assert len(statements) == 1
+    assert " JOIN " not in statements[0][0]
+
+def test_writes_within_a_second_change_the_etag(client, auth_headers, store):
+    customer = create_customer(client, auth_headers, store["id"])
+    url = f"/customers/{customer['id']}"
+    etags = []
+    for name in ("First", "Second", "Third"):
+        assert client.put(url, headers=auth_headers, json={"name": name}).status_code == 200
+        etags.append(client.get(url, headers=auth_headers).headers["ETag"])
+    assert len(set(etags)) == len(etags)
+
+def test_last_modified_waits_until_the_second_is_over(client, auth_headers, store):
+    customer = create_customer(client, auth_headers, store["id"])
+    url = f"/customers/{customer['id']}"
+    assert "Last-Modified" not in client.get(url, headers=auth_headers).headers
+
+    time.sleep(1.1)
+    last_modified = client.get(url, headers=auth_headers).headers["Last-Modified"]
+    response = client.get(url, headers={**auth_headers, "If-Modified-Since": last_modified})
+    assert response.status_code == 304
+
+    assert client.put(url, headers=auth_headers, json={"name": "Changed"}).status_code == 200
+    response = client.get(url, headers={**auth_headers, "If-Modified-Since": last_modified})
+    assert response.status_code == 200
+    assert "Last-Modified" not in response.headers
@@ -0,0 +1,43 @@
+from sqlalchemy.orm import joinedload
+from app.database.database import SessionLocal
+from app.database.models import Products, Roles
+from app.routers.utils import only_store_filtered
+from tests.helpers import unique_name
+from tests.test_pagination import create_products
+
+def last_page(response) -> str:
+    assert response.status_code == 200, response.text
+    return response.headers["X-Last-Page"].rsplit("page=", 1)[-1]
+
+def test_estimated_role_totals_include_global_roles(client, auth_headers, store):
+    client.post("/roles", headers=auth_headers, json={"name": unique_name("role"), "store_id": store["id"]})
+    db = SessionLocal()
+    try:
+        total_roles = db.query(Roles).count()
+        global_roles = db.query(Roles).filter(Roles.store_id.is_(None)).count()
+    finally:
+        db.close()
+    assert global_roles > 0
+
+    exact = client.get("/roles", headers=auth_headers, params={"page_size": 1})
+    estimated = client.get("/roles", headers=auth_headers, params={"page_size": 1, "exact_count": False})
+    assert last_page(exact) == last_page(estimated) == str(total_roles)
+
+def test_store_listing_estimates_follow_the_store_counters(client, auth_headers, store):
+    create_products(client, auth_headers, store["id"], [1.0, 2.0, 3.0])
+    response = client.get(f"/products/store/{store['id']}", headers=auth_headers, params={"page_size": 1, "exact_count": False})
+    assert last_page(response) == "3"
+
+def test_only_store_filtered():
+    db = SessionLocal()
+    try:
+        products = db.query(Products).options(joinedload(Products.store))
+        assert only_store_filtered(products, Products, None)
+        assert not only_store_filtered(products, Products, {"a"})
+        assert only_store_filtered(products.filter(Products.store_id == "a"), Products, {"a"})
+        assert only_store_filtered(products.filter(Products.store_id.in_(["a", "b"])).filter(Products.store_id == "a"), Products, {"a"})
+        assert not only_store_filtered(products.filter(Products.store_id.in_(["a", "b"])), Products, {"a"})
+        assert not only_store_filtered(products.filter(Products.store_id == "a", Products.stock > 0), Products, {"a"})
+        assert not only_store_filtered(products.filter(Products.name == "a"), Products, None)
+    finally:
+        db.close()
@@ -0,0 +1,88 @@
+import threading
+import time
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+from app.database.database import create_db_engine
+
+def database_url(directory, name:str) -> str:
+    return f"sqlite:///{directory / name}.db"
+
+@pytest.mark.parametrize("url", ["sqlite://", "sqlite:///:memory:"])
+def test_in_memory_engines_share_one_database_across_threads(url):
+    engine = create_db_engine(url)
+    with engine.begin() as connection:
+        connection.execute(text("CREATE TABLE items (id INTEGER PRIMARY KEY)"))
+
+    def insert():
+        with engine.begin() as connection:
+            connection.execute(text("INSERT INTO items DEFAULT VALUES"))
+    thread = threading.Thread(target=insert)
+    thread.start()
+    thread.join()
+
+    with engine.connect() as connection:
+        assert connection.execute(text("SELECT count(*) FROM items")).scalar_one() == 1
+
+def test_file_engines_apply_pragmas_and_read_only_engines_refuse_writes(tmp_path):
+    url = database_url(tmp_path, "pragmas")
+    engine = create_db_engine(url)
+    read_engine = create_db_engine(url, read_only=True)
+    with engine.begin() as connection:
+        assert connection.execute(text("PRAGMA journal_mode")).scalar_one() == "wal"
+        assert connection.execute(text("PRAGMA synchronous")).scalar_one() == 1 # NORMAL
+        connection.execute(text("CREATE TABLE items (id INTEGER PRIMARY KEY)"))
+
+    with read_engine.connect() as connection:
+        assert connection.execute(text("SELECT count(*) FROM items")).scalar_one() == 0
+        with pytest.raises(OperationalError):
+            connection.execute(text("INSERT INTO items DEFAULT VALUES"))
+
+def mixed_workload(write_engine, read_engine, writers:int = 4, readers:int = 8, operations:int = 100) -> tuple[float, int]:
+    """
+    Writer threads insert one row per transaction while reader threads scan the
+    table. Returns (operations per second, operations that failed).
+    """
+    with write_engine.begin() as connection:
+        connection.execute(text("CREATE TABLE events (id INTEGER PRIMARY KEY, payload TEXT)"))
+    errors = []
+
+    def write():
+        for index in range(operations):
+            try:
+                with write_engine.begin() as connection:
+                    connection.execute(text("INSERT INTO events (payload) VALUES (:payload)"), {"payload": "x" * 200})
+            except OperationalError as error:
+                errors.append(error)
+
+    def read():
+        for _ in range(operations):
+            try:
+                with read_engine.connect() as connection:
+                    connection.execute(text("SELECT count(*), max(id) FROM events")).one()
+            except OperationalError as error:
+                errors.append(error)
+
+    threads = [threading.Thread(target=write) for _ in range(writers)] + [threading.Thread(target=read) for _ in range(readers)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return (writers + readers) * operations / (time.perf_counter() - start), len(errors)
+
+@pytest.mark.benchmark
+def test_mixed_read_write_throughput(tmp_path):
+    default_url = database_url(tmp_path, "default-profile")
+    # The engine settings this project used before the tuned profile
+    default_engine = create_engine(default_url, connect_args={"check_same_thread": False, "timeout": 30})
+    default_throughput, default_errors = mixed_workload(default_engine, default_engine)
+
+    tuned_url = database_url(tmp_path, "tuned-profile")
+    tuned_throughput, tuned_errors = mixed_workload(create_db_engine(tuned_url), create_db_engine(tuned_url, read_only=True))
+
+    print(f"\nmixed read/write: {default_throughput:.0f} ops/s ({default_errors} errors) with the default engine, "
+          f"{tuned_throughput:.0f} ops/s ({tuned_errors} errors) with the tuned profile")
+    assert tuned_errors == 0
+    assert tuned_errors <= default_errors
+    assert tuned_throughput > default_throughput
@@ -0,0 +1,69 @@
+import pytest
+from app.database.database import engine
+from tests.helpers import count_statements
+from tests.test_orders import create_customer, create_product
+
+def query_plans(statements:list[tuple], table:str, ordered:bool = False) -> list[str]:
+    """
+    EXPLAIN QUERY PLAN of each recorded SELECT reading from table (only the ones with
+    an ORDER BY when ordered), one " | "-joined string per statement.
+    """
+    plans = []
+    with engine.connect() as connection:
+        for statement, parameters in statements:
+            if not statement.lstrip().upper().startswith("SELECT") or f"FROM {table}" not in statement:
+                continue
+            if ordered and "ORDER BY" not in statement:
+                continue
+            rows = connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).all()
+            plans.append(" | ".join(row[-1] for row in rows))
+    assert plans, f"no SELECT on {table} was recorded"
+    return plans
+
+def assert_uses_index(plans:list[str], index_name:str) -> None:
+    for plan in plans:
+        assert f"INDEX {index_name}" in plan, plan
+        assert "TEMP B-TREE" not in plan, plan
+
+def list_offset_and_keyset(client, auth_headers, url:str, params:dict) -> list[tuple]:
+    """Statements of an offset page, the first keyset page and the keyset page after it."""
+    with count_statements() as statements:
+        response = client.get(url, headers=auth_headers, params=params)
+        assert response.status_code == 200, response.text
+        response = client.get(url, headers=auth_headers, params={**params, "cursor": ""})
+        assert response.status_code == 200, response.text
+        next_page = response.headers.get("X-Next-Page")
+        assert next_page
+        response = client.get(next_page, headers=auth_headers)
+        assert response.status_code == 200, response.text
+    return statements
+
+@pytest.fixture
+def store_with_orders(client, auth_headers, store) -> dict:
+    customer = create_customer(client, auth_headers, store["id"])
+    for price in (5.0, 7.5, 12.0):
+        product = create_product(client, auth_headers, store["id"], stock=10, price=price)
+        response = client.post("/orders", headers=auth_headers, json={
+            "store_id": store["id"], "customer_id": customer["id"],
+            "order_products": [{"product_id": product["id"], "quantity": 1}],
+        })
+        assert response.status_code == 200, response.text
+    return store
+
+@pytest.mark.parametrize("order_dir", ["asc", "desc"])
+@pytest.mark.parametrize("order_by", ["created_at", "price", "name"])
+def test_store_product_listing_walks_the_store_index(client, auth_headers, store_with_orders, order_by, order_dir):
+    statements = list_offset_and_keyset(client, auth_headers, f"/products/store/{store_with_orders['id']}",
+                                        {"page_size": 2, "order_by": order_by, "order_dir": order_dir})
+
+    assert_uses_index(query_plans(statements, "products", ordered=True), f"ix_products_store_id_{order_by}")
+    for plan in query_plans(statements, "products"):
+        assert "SCAN products" not in plan, plan
+
+@pytest.mark.parametrize("order_dir", ["asc", "desc"])
+def test_store_order_listing_and_order_products_use_indexes(client, auth_headers, store_with_orders, order_dir):
+    statements = list_offset_and_keyset(client, auth_headers, f"/orders/store/{store_with_orders['id']}",
+                                        {"page_size": 2, "order_by": "created_at", "order_dir": order_dir})
+
+    assert_uses_index(query_plans(statements, "orders", ordered=True), "ix_orders_store_id_created_at")
+    assert_uses_index(query_plans(statements, "order_products"), "ix_order_products_order_id")
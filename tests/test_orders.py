@@ -0,0 +1,96 @@
+import json
+import time
+import pytest
+from fastapi import Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from app.database.database import SessionLocal
+from app.database.models import Orders
+from app.routers.orders import ORDER_LIST_ADAPTER, ORDER_RESPONSE_OPTIONS
+from app.routers.utils import json_list_response
+from tests.helpers import send_concurrently
+
+def create_customer(client, auth_headers, store_id:str) -> dict:
+    response = client.post("/customers", headers=auth_headers, json={
+        "name": "Customer", "email": "customer@example.com", "phone": "123", "store_id": store_id,
+    })
+    assert response.status_code == 201, response.text
+    return response.json()
+
+def create_product(client, auth_headers, store_id:str, stock:int, price:float = 10.0) -> dict:
+    response = client.post("/products", headers=auth_headers, json={
+        "name": "Hot product", "price": price, "stock": stock, "store_id": store_id,
+    })
+    assert response.status_code == 201, response.text
+    return response.json()
+
+@pytest.mark.benchmark
+def test_concurrent_orders_never_oversell_a_hot_product(app, client, auth_headers, store):
+    initial_stock = 25
+    customer = create_customer(client, auth_headers, store["id"])
+    product = create_product(client, auth_headers, store["id"], initial_stock)
+    quantities = [1, 2, 3] * 10
+    order_requests = [
+        ("POST", "/orders", {"headers": auth_headers, "json": {
+            "store_id": store["id"], "customer_id": customer["id"],
+            "order_products": [{"product_id": product["id"], "quantity": quantity}],
+        }})
+        for quantity in quantities
+    ]
+
+    start = time.perf_counter()
+    responses = send_concurrently(app, order_requests)
+    elapsed = time.perf_counter() - start
+
+    assert {response.status_code for response in responses} <= {200, 400}, [response.text for response in responses if response.status_code not in (200, 400)]
+    sold = sum(line["quantity"] for response in responses if response.status_code == 200 for line in response.json()["order_products"])
+    final_stock = client.get(f"/products/{product['id']}", headers=auth_headers).json()["stock"]
+    print(f"\n{len(order_requests)} concurrent orders for one product in {elapsed:.2f}s "
+          f"({len(order_requests) / elapsed:.0f} orders/s), sold {sold} of {initial_stock}")
+
+    assert final_stock >= 0
+    assert sold + final_stock == initial_stock
+    assert final_stock == 0 # demand (60 units) exceeds the stock, partial fills included
+
+@pytest.mark.benchmark
+def test_large_order_pages_serialize_straight_to_bytes(client, auth_headers, store):
+    customer = create_customer(client, auth_headers, store["id"])
+    products = [create_product(client, auth_headers, store["id"], stock=1000, price=price) for price in (1.5, 2.5, 4.0, 8.0, 9.5)]
+    response = client.post("/orders/batch", headers=auth_headers, json={"orders": [
+        {"store_id": store["id"], "customer_id": customer["id"],
+         "order_products": [{"product_id": product["id"], "quantity": 1} for product in products]}
+        for _ in range(100)
+    ]})
+    assert response.status_code == 200, response.text
+
+    response = client.get(f"/orders/store/{store['id']}?page_size=100", headers=auth_headers)
+    assert response.status_code == 200, response.text
+    page = response.json()
+    assert len(page) == 100
+    assert all(order["customer"]["id"] == customer["id"] and len(order["order_products"]) == 5 for order in page)
+
+    db = SessionLocal()
+    try:
+        orders = db.query(Orders).options(*ORDER_RESPONSE_OPTIONS).filter(Orders.store_id == store["id"]).all()
+
+        def response_model_path() -> bytes:
+            # What FastAPI did before: validate against response_model, encode, json.dumps
+            validated = ORDER_LIST_ADAPTER.validate_python(orders, from_attributes=True)
+            return JSONResponse(jsonable_encoder(validated)).body
+
+        def json_list_path() -> bytes:
+            return json_list_response(ORDER_LIST_ADAPTER, orders, Response()).body
+
+        assert json.loads(response_model_path()) == json.loads(json_list_path())
+        rounds = 20
+        timings = {}
+        for name, serialize in (("response_model + JSONResponse", response_model_path), ("json_list_response", json_list_path)):
+            start = time.perf_counter()
+            for _ in range(rounds):
+                serialize()
+            timings[name] = (time.perf_counter() - start) / rounds * 1000
+    finally:
+        db.close()
+
+    print("\n" + ", ".join(f"{name}: {ms:.2f}ms per 100-order page" for name, ms in timings.items()))
+    assert timings["json_list_response"] < timings["response_model + JSONResponse"]
@@ -0,0 +1,60 @@
+import pytest
+
+def create_products(client, auth_headers, store_id:str, prices:list[float]) -> list[dict]:
+    products = []
+    for index, price in enumerate(prices):
+        response = client.post("/products", headers=auth_headers, json={
+            "name": f"product-{index}", "price": price, "stock": 10, "store_id": store_id,
+        })
+        assert response.status_code == 201, response.text
+        products.append(response.json())
+    return products
+
+def list_products(client, auth_headers, url:str) -> tuple[list[dict], str|None]:
+    response = client.get(url, headers=auth_headers)
+    assert response.status_code == 200, response.text
+    return response.json(), response.headers.get("X-Next-Page")
+
+@pytest.mark.parametrize("order_dir", ["asc", "desc"])
+def test_cursor_pages_cover_every_row_once(client, auth_headers, store, order_dir):
+    products = create_products(client, auth_headers, store["id"], [5.0, 1.0, 3.0, 3.0, 2.0, 4.0, 3.0])
+
+    listed, next_page = list_products(client, auth_headers, f"/products/store/{store['id']}?order_by=price&order_dir={order_dir}&page_size=2&cursor=")
+    while next_page:
+        page, next_page = list_products(client, auth_headers, next_page)
+        listed += page
+
+    assert sorted(product["id"] for product in listed) == sorted(product["id"] for product in products)
+    prices = [product["price"] for product in listed]
+    assert prices == sorted(prices, reverse=order_dir == "desc")
+
+@pytest.mark.parametrize("order_dir", ["asc", "desc"])
+def test_cursor_survives_deleting_the_anchor_row(client, auth_headers, store, order_dir):
+    create_products(client, auth_headers, store["id"], [1.0, 2.0, 3.0, 4.0, 5.0, 6.0])
+
+    first_page, next_page = list_products(client, auth_headers, f"/products/store/{store['id']}?order_by=price&order_dir={order_dir}&page_size=2&cursor=")
+    assert client.delete(f"/products/{first_page[-1]['id']}", headers=auth_headers).status_code == 204
+    second_page, _ = list_products(client, auth_headers, next_page)
+
+    expected = [3.0, 4.0] if order_dir == "asc" else [4.0, 3.0]
+    assert [product["price"] for product in second_page] == expected
+
+def test_cursor_keeps_its_position_when_the_anchor_row_moves(client, auth_headers, store):
+    create_products(client, auth_headers, store["id"], [1.0, 2.0, 3.0, 4.0, 5.0, 6.0])
+
+    first_page, next_page = list_products(client, auth_headers, f"/products/store/{store['id']}?order_by=price&order_dir=asc&page_size=2&cursor=")
+    response = client.put(f"/products/{first_page[-1]['id']}", headers=auth_headers, json={"price": 0.5})
+    assert response.status_code == 200, response.text
+    second_page, _ = list_products(client, auth_headers, next_page)
+
+    assert [product["price"] for product in second_page] == [3.0, 4.0]
+
+def test_cursor_on_timestamp_column_has_no_gaps(client, auth_headers, store):
+    products = create_products(client, auth_headers, store["id"], [1.0, 2.0, 3.0, 4.0, 5.0])
+
+    listed, next_page = list_products(client, auth_headers, f"/products/store/{store['id']}?order_by=created_at&order_dir=desc&page_size=2&cursor=")
+    while next_page:
+        page, next_page = list_products(client, auth_headers, next_page)
+        listed += page
+
+    assert sorted(product["id"] for product in listed) == sorted(product["id"] for product in products)
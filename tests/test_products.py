@@ -0,0 +1,43 @@
+from app.database.database import SessionLocal
+from app.database.models import Products
+from app.routers.response_cache import invalidate_product_responses
+from tests.test_orders import create_product
+
+def change_stock_on_another_worker(product_id:str, stock:int, invalidate:bool = True) -> None:
+    """
+    Writes through its own session and never touches this process's response cache,
+    the way a product update served by a different uvicorn worker would.
+    """
+    db = SessionLocal()
+    try:
+        db.query(Products).filter(Products.id == product_id).update({Products.stock: stock})
+        if invalidate:
+            invalidate_product_responses(db)
+        db.commit()
+    finally:
+        db.close()
+
+def test_cached_product_responses_follow_writes_from_other_workers(client, auth_headers, store):
+    product = create_product(client, auth_headers, store["id"], stock=5)
+    product_url, listing_url = f"/products/{product['id']}", f"/products/store/{store['id']}"
+    assert client.get(product_url, headers=auth_headers).json()["stock"] == 5
+    assert client.get(listing_url, headers=auth_headers).json()[0]["stock"] == 5
+
+    change_stock_on_another_worker(product["id"], 3)
+
+    assert client.get(product_url, headers=auth_headers).json()["stock"] == 3
+    assert client.get(listing_url, headers=auth_headers).json()[0]["stock"] == 3
+
+def test_product_responses_are_cached_until_the_generation_moves(client, auth_headers, store):
+    product = create_product(client, auth_headers, store["id"], stock=5)
+    product_url = f"/products/{product['id']}"
+    first = client.get(product_url, headers=auth_headers)
+
+    change_stock_on_another_worker(product["id"], 4, invalidate=False)
+    cached = client.get(product_url, headers=auth_headers)
+    assert cached.json()["stock"] == 5
+    assert cached.headers["ETag"] == first.headers["ETag"]
+
+    response = client.put(product_url, headers=auth_headers, json={"price": 11.0})
+    assert response.status_code == 200, response.text
+    assert client.get(product_url, headers=auth_headers).json() == {**response.json(), "stock": 4}
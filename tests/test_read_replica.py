@@ -0,0 +1,91 @@
+import hashlib
+import hmac
+import sqlite3
+import time
+import pytest
+from fastapi.testclient import TestClient
+from app.database import database
+from app.database.database import create_db_engine
+from app import middleware
+from app.middleware import READ_YOUR_WRITES_COOKIE, last_write_signature
+from app.main import create_app
+from app.settings import Settings
+from tests.helpers import unique_name
+
+@pytest.fixture
+def lagging_replica(client, tmp_path, monkeypatch):
+    """
+    A second SQLite file holding a snapshot of the primary, standing in for a replica
+    that hasn't caught up: anything written after the snapshot is only on the primary.
+    """
+    replica_path = tmp_path / "replica.db"
+    primary = sqlite3.connect(database.engine.url.database)
+    replica = sqlite3.connect(replica_path)
+    try:
+        primary.backup(replica)
+    finally:
+        primary.close()
+        replica.close()
+
+    replica_engine = create_db_engine(f"sqlite:///{replica_path}", read_only=True)
+    monkeypatch.setattr(database, "READ_REPLICA_CONFIGURED", True)
+    monkeypatch.setitem(database.ReadSessionLocal.kw, "bind", replica_engine)
+    yield replica_engine
+    replica_engine.dispose()
+
+def create_store(client:TestClient, auth_headers:dict) -> str:
+    name = unique_name("replica-store")
+    response = client.post("/stores", headers=auth_headers, json={"name": name, "address": "Replica Address 1"})
+    assert response.status_code in (200, 201), response.text
+    return name
+
+def listed_store_names(client:TestClient, auth_headers:dict) -> set[str]:
+    response = client.get("/stores", headers=auth_headers, params={"page_size": 100})
+    assert response.status_code == 200, response.text
+    return {store["name"] for store in response.json()}
+
+def test_writer_reads_its_write_and_others_read_the_replica(app, auth_headers, lagging_replica):
+    writer, other = TestClient(app), TestClient(app)
+    name = create_store(writer, auth_headers)
+
+    assert writer.cookies.get(READ_YOUR_WRITES_COOKIE)
+    assert name in listed_store_names(writer, auth_headers)
+    assert name not in listed_store_names(other, auth_headers)
+
+def test_pin_holds_on_another_worker(app, auth_headers, lagging_replica):
+    """The cookie is all the next worker needs: nothing is kept in the first process."""
+    other_app = create_app(Settings(sqlite_logging=False))
+    writer = TestClient(app)
+    name = create_store(writer, auth_headers)
+
+    cookies = {READ_YOUR_WRITES_COOKIE: writer.cookies[READ_YOUR_WRITES_COOKIE]}
+    assert name in listed_store_names(TestClient(other_app, cookies=cookies), auth_headers)
+    assert name not in listed_store_names(TestClient(other_app), auth_headers)
+
+def test_forged_and_expired_pins_read_the_replica(app, auth_headers, lagging_replica, monkeypatch):
+    monkeypatch.setattr(middleware, "READ_YOUR_WRITES_SECONDS", 0.5)
+    writer = TestClient(app)
+    name = create_store(writer, auth_headers)
+    cookie = writer.cookies[READ_YOUR_WRITES_COOKIE]
+
+    timestamp, _, signature = cookie.rpartition(".")
+    forged = f"{float(timestamp) + 3600:.3f}.{signature}"
+    assert name not in listed_store_names(TestClient(app, cookies={READ_YOUR_WRITES_COOKIE: forged}), auth_headers)
+
+    time.sleep(0.6)
+    assert name not in listed_store_names(TestClient(app, cookies={READ_YOUR_WRITES_COOKIE: cookie}), auth_headers)
+
+def test_no_cookie_without_a_replica(client, auth_headers):
+    response = client.post("/stores", headers=auth_headers, json={"name": unique_name("store"), "address": "Test Address 1"})
+    assert response.status_code in (200, 201), response.text
+    assert READ_YOUR_WRITES_COOKIE not in response.cookies
+
+def test_pin_signing_key_comes_from_the_jwt_secret(app, auth_headers, lagging_replica):
+    writer = TestClient(app)
+    name = create_store(writer, auth_headers)
+    timestamp = writer.cookies[READ_YOUR_WRITES_COOKIE].rpartition(".")[0]
+
+    old_default = hmac.new(b"read your writes secret", timestamp.encode(), hashlib.sha256).hexdigest()[:32]
+    assert last_write_signature(timestamp) != old_default
+    reader = TestClient(app, cookies={READ_YOUR_WRITES_COOKIE: f"{timestamp}.{old_default}"})
+    assert name not in listed_store_names(reader, auth_headers)
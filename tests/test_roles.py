@@ -0,0 +1,49 @@
+from app.database.database import SessionLocal
+from app.database.models import Permissions, RolePermissions
+from app.initialization import get_global_admin_role, sync_admin_role_permissions
+from tests.helpers import count_statements, unique_name
+
+def create_roles(client, auth_headers, store_id:str, count:int, permission_ids:list[str]) -> None:
+    for _ in range(count):
+        response = client.post("/roles", headers=auth_headers, json={
+            "name": unique_name("role"), "store_id": store_id, "role_permissions": permission_ids,
+        })
+        assert response.status_code == 200, response.text
+
+def test_role_listing_query_count_does_not_grow_with_page_size(client, auth_headers, store):
+    permission_ids = [permission["id"] for permission in client.get("/permissions?page_size=3", headers=auth_headers).json()]
+    create_roles(client, auth_headers, store["id"], 12, permission_ids)
+
+    statement_counts = {}
+    for page_size in (2, 12):
+        url = f"/roles/store/{store['id']}?page_size={page_size}"
+        client.get(url, headers=auth_headers) # warms the permission and count caches
+        with count_statements() as statements:
+            response = client.get(url, headers=auth_headers)
+        assert response.status_code == 200
+        roles = response.json()
+        assert len(roles) == page_size
+        assert all(len(role["role_permissions"]) == len(permission_ids) for role in roles)
+        statement_counts[page_size] = len(statements)
+
+    assert statement_counts[2] == statement_counts[12]
+
+def test_only_the_global_admin_role_gets_new_permissions(client, auth_headers, store):
+    permission_ids = [permission["id"] for permission in client.get("/permissions?page_size=1", headers=auth_headers).json()]
+    response = client.post("/roles", headers=auth_headers, json={"name": "admin", "store_id": store["id"], "role_permissions": permission_ids})
+    assert response.status_code == 200, response.text
+    tenant_admin_id = response.json()["id"]
+
+    db = SessionLocal()
+    try:
+        sync_admin_role_permissions(db)
+        tenant_permissions = db.query(RolePermissions).filter(RolePermissions.role_id == tenant_admin_id).count()
+        global_admin = get_global_admin_role(db)
+        global_permissions = db.query(RolePermissions).filter(RolePermissions.role_id == global_admin.id).count()
+        all_permissions = db.query(Permissions).count()
+    finally:
+        db.close()
+
+    assert global_admin.id != tenant_admin_id
+    assert global_permissions == all_permissions
+    assert tenant_permissions == len(permission_ids)
@@ -0,0 +1,58 @@
+from app.database.database import SessionLocal
+from app.database.models import UserStores
+from tests.helpers import count_statements, unique_name
+
+def create_user(client, auth_headers, store_id:str, role_ids:list[str] = []) -> dict:
+    response = client.post("/users", headers=auth_headers, json={
+        "name": unique_name("user"), "email": f"{unique_name('user')}@example.com", "password": "secret",
+        "user_stores": [store_id], "user_roles": role_ids,
+    })
+    assert response.status_code == 200, response.text
+    return response.json()
+
+def test_store_user_listing_query_count_does_not_grow_with_page_size(client, auth_headers, store):
+    role = client.post("/roles", headers=auth_headers, json={
+        "name": unique_name("role"), "store_id": store["id"],
+        "role_permissions": [permission["id"] for permission in client.get("/permissions?page_size=3", headers=auth_headers).json()],
+    }).json()
+    for _ in range(6):
+        create_user(client, auth_headers, store["id"], [role["id"]])
+
+    statement_counts = {}
+    for page_size in (2, 6):
+        url = f"/users/store/{store['id']}?page_size={page_size}"
+        client.get(url, headers=auth_headers)
+        with count_statements() as statements:
+            response = client.get(url, headers=auth_headers)
+        users = response.json()
+        assert len(users) == page_size
+        assert all(user["user_roles"][0]["role_permissions"] for user in users)
+        statement_counts[page_size] = len(statements)
+
+    assert statement_counts[2] == statement_counts[6]
+
+def test_store_user_listing_returns_each_user_once(client, auth_headers, store):
+    user_ids = {create_user(client, auth_headers, store["id"])["id"] for _ in range(3)}
+    db = SessionLocal()
+    try:
+        # user_stores has no unique constraint, so a user can be linked to a store twice
+        db.add(UserStores(user_id=next(iter(user_ids)), store_id=store["id"]))
+        db.commit()
+    finally:
+        db.close()
+
+    response = client.get(f"/users/store/{store['id']}?page_size=2&order_by=name", headers=auth_headers)
+    second_page = client.get(response.headers["X-Next-Page"], headers=auth_headers)
+    listed_ids = [user["id"] for user in response.json() + second_page.json()]
+
+    assert len(listed_ids) == len(set(listed_ids))
+    assert user_ids <= set(listed_ids)
+    assert "X-Next-Page" not in second_page.headers
+
+def test_updated_password_is_hashed_and_accepted_at_login(client, auth_headers, store):
+    user = create_user(client, auth_headers, store["id"])
+    response = client.put(f"/users/{user['id']}", headers=auth_headers, json={"password": "new secret"})
+    assert response.status_code == 200, response.text
+
+    login = client.post("/auth/login", data={"username": user["email"], "password": "new secret"})
+    assert login.status_code == 200, login.text